@@ -1,8 +1,21 @@
+import os
+import sys
 from random import randint
+
 import bpy
 import bmesh
+import numpy as np
+
+# the helper modules live next to this script, make sure Blender can find them
+SCRIPT_DIRECTORY = os.path.dirname(os.path.abspath(__file__))
+if SCRIPT_DIRECTORY not in sys.path:
+    sys.path.append(SCRIPT_DIRECTORY)
+
+import mesh_builder
+from dungeon_layout import EMPTY, WALL, new_tile_grid, place_rooms, connection_edges, carve_corridor, fill_room
 
-ROOM_MIN = 1000
+DIRECT_MESH = True  # build only the exposed faces straight from the map, set to False for cubes + cleanup_mesh
+GREEDY_MESH = False  # merge coplanar faces into larger rectangles, far fewer faces for game engines
 
 
 class Dungeon:
@@ -14,95 +27,44 @@ class Dungeon:
         self.min_rooms = 10
         self.max_rooms = 15
         self.num_rooms = None
+        self.max_placement_attempts = 200  # rejected rooms in a row before the fallback kicks in
+        self.placement_fallback = 'shrink'  # 'shrink' the rooms or 'stop' placing them
+        self.extra_connections = 0  # corridors on top of the ones needed to connect every room, these make loops
         self.map = None
         self.rooms = None
         self.connected = None
 
     def generate(self):
-        self.map = []
         self.rooms = []
         self.connected = []
 
-        for y in range(self.y_size):  # build out the initial 2d grid array
-            self.map.append([])
-            for x in range(self.x_size):  # initialize each row
-                self.map[y].append({})
-                self.map[y][x]['t'] = 0
-                self.map[y][x]['pos'] = {
-                    'x': x,
-                    'y': y
-                }
-                self.map[y][x]['r'] = 1
+        self.map = new_tile_grid(self.x_size, self.y_size)  # tile types
 
         self.num_rooms = get_random_int(self.min_rooms, self.max_rooms)  # set the total number of rooms to be generated
 
-        i = 0
-        while i < self.num_rooms:
-            # generate rooms, check if the are overlapping, shrink the w and h by 1
-            room = {}
-            room['x'] = get_random_int(1, (self.x_size - self.max_room_size - 1))
-            room['y'] = get_random_int(1, (self.y_size - self.max_room_size - 1))
-            room['w'] = get_random_int(self.min_room_size, self.max_room_size)
-            room['h'] = get_random_int(self.min_room_size, self.max_room_size)
-            room['connected'] = False
-            if self.does_collide(room):
-                continue
-            room['w'] -= 1
-            room['h'] -= 1
-            self.rooms.append(room)
-            i += 1
-        for k in range(len(self.rooms)):
-            room = self.rooms[k]
-            closest_room = self.find_closest(room, self.connected)
-            if closest_room is None:
-                break
-            self.connect_rooms(room, closest_room, True)
-        for k in range(len(self.rooms)):
-            room = self.rooms[k]
-            for y in range(room['y'], room['y'] + room['h']):
-                for x in range(room['x'], room['x'] + room['w']):
-                    self.map[y][x]['t'] = 1
+        # rooms get placed with a spatial hash and a bounded number of retries, so crowded maps can not hang
+        self.rooms = place_rooms(self.num_rooms, self.random_room, self.min_room_size, self.max_room_size,
+                                 self.max_placement_attempts, self.placement_fallback)
+        if len(self.rooms) < self.num_rooms:
+            print(f'could only place {len(self.rooms)} of {self.num_rooms} rooms')
+            self.num_rooms = len(self.rooms)
+        # corridors follow a minimum spanning tree over the room centers plus a few optional loops,
+        # which guarantees that every room can be reached
+        for room_index, other_index in connection_edges(self.rooms, self.extra_connections):
+            self.connect_rooms(self.rooms[other_index], self.rooms[room_index], True)
+        for room in self.rooms:
+            fill_room(self.map, room)
         self.place_cubes()
 
-    def does_collide(self, room):
-        for i in range(len(self.rooms)):
-            comparison_room = self.rooms[i]
-            if room == comparison_room:
-                continue
-            if room['x'] < comparison_room['x'] + comparison_room['w'] \
-                    and room['x'] + room['w'] > comparison_room['x'] \
-                    and room['y'] < comparison_room['y'] + comparison_room['h'] \
-                    and room['y'] + room['h'] > comparison_room['y']:
-                return True
-        return False
-
-    def find_closest(self, room, others=None):
-        master_room = {'x': room['x'] + room['w'] / 2,
-                       'y': room['y'] + room['h'] / 2
-                       }
-        room_min = ROOM_MIN
-        final_room = None
-        for i in range(len(self.rooms)):
-            comparison_room = self.rooms[i]
-            if room == comparison_room:
-                continue
-            if others is not None:
-                is_closest = False
-                for j in range(len(others)):
-                    if comparison_room == others[j]:
-                        is_closest = True
-                        break
-                if is_closest:
-                    continue
-            room_avg = {
-                'x': comparison_room['x'] + comparison_room['w'] / 2,
-                'y': comparison_room['y'] + comparison_room['h'] / 2
-            }
-            room_calc = abs(room_avg['x'] - master_room['x']) + abs(room_avg['y'] - master_room['y'])
-            if room_calc < room_min:
-                room_min = room_calc
-                final_room = comparison_room
-        return final_room
+    # draws a random room with sides from min_room_size up to max_size, the placement is not checked here
+    def random_room(self, max_size):
+        room = {}
+        room['x'] = get_random_int(1, (self.x_size - self.max_room_size - 1))
+        room['y'] = get_random_int(1, (self.y_size - self.max_room_size - 1))
+        room['w'] = get_random_int(self.min_room_size, max_size)
+        room['h'] = get_random_int(self.min_room_size, max_size)
+        room['connected'] = False
+        return room
 
     def connect_rooms(self, room, closest_room, should_connect):
         path_part_1 = {
@@ -113,36 +75,26 @@ class Dungeon:
             'x': get_random_int(closest_room['x'], closest_room['x'] + closest_room['w']),
             'y': get_random_int(closest_room['y'], closest_room['y'] + closest_room['h'])
         }
-        while path_part_1['x'] != path_part_2['x'] or path_part_1['y'] != path_part_2['y']:
-            if path_part_1["x"] != path_part_2["x"]:
-                if path_part_2["x"] < path_part_1["x"]:
-                    path_part_2["x"] += 1
-                else:
-                    path_part_2["x"] -= 1
-            else:
-                if path_part_1["y"] != path_part_2["y"]:
-                    if path_part_2["y"] < path_part_1["y"]:
-                        path_part_2["y"] += 1
-                    else:
-                        path_part_2["y"] -= 1
-
-            self.map[path_part_2['y']][path_part_2['x']]['t'] = 1
+        # the corridor runs from the second room to the first one, along x first and then along y
+        carve_corridor(self.map, path_part_2['x'], path_part_2['y'], path_part_1['x'], path_part_1['y'])
         if should_connect:
             room['connected'] = True
             closest_room['connected'] = True
             self.connected.append(room)
 
+    # every cell that is not empty or a wall gets a cube, all of them in one mesh
+    # (or just the exposed faces of those cubes with DIRECT_MESH)
     def place_cubes(self):
-        yy = 0
-        for y in range(self.y_size):
-            xx = 0
-            for x in range(self.x_size):
-                if self.map[y][x]['t'] == 0 or self.map[y][x]['t'] == 2:
-                    pass
-                else:
-                    bpy.ops.mesh.primitive_cube_add(size=2, enter_editmode=False, location=(xx, yy, 0))
-                xx += 2
-            yy += 2
+        solid = (self.map != EMPTY) & (self.map != WALL)
+        builder = mesh_builder.BatchMeshBuilder()
+        if DIRECT_MESH:
+            builder.add_grid_shell(solid, greedy=GREEDY_MESH)
+            if GREEDY_MESH:
+                print(f'greedy meshing: {builder.unmerged_face_count} faces -> {builder.face_count}')
+        else:
+            cube_y, cube_x = np.nonzero(solid)
+            builder.add_cubes(np.column_stack((cube_x, cube_y)) * 2)
+        builder.to_object('Cube')
 
 
 def get_random_int(low, high):
@@ -192,4 +144,5 @@ if __name__ == '__main__':
     clear_scene()
     dungeon = Dungeon()
     dungeon.generate()
-    cleanup_mesh()
+    if not DIRECT_MESH:
+        cleanup_mesh()
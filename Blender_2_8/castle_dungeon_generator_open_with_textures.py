@@ -1,6 +1,24 @@
+import os
+import sys
 from random import randint
+
 import bpy
 import bmesh
+import numpy as np
+
+# the helper modules live next to this script, make sure Blender can find them
+SCRIPT_DIRECTORY = os.path.dirname(os.path.abspath(__file__))
+if SCRIPT_DIRECTORY not in sys.path:
+    sys.path.append(SCRIPT_DIRECTORY)
+
+import mesh_builder
+from dungeon_layout import EMPTY, FLOOR, WALL, STAIRS_UP, STAIRS_DOWN, RENDER, new_tile_grid, new_flag_grid, \
+    place_rooms, connection_edges, room_centers, farthest_pair, carve_corridor, fill_room, build_wall_ring
+
+GREEDY_MESH = False  # merge the walls and floor tiles into large rectangles, the UVs keep the textures seamless
+# material slot per tile type, in the order the materials get appended below (castlebrick, cobblestone)
+TILE_MATERIALS = {WALL: 0, FLOOR: 1, STAIRS_UP: 0, STAIRS_DOWN: 0}
+FLOOR_Z = -1  # height of the floor planes, every face down here (wall bottoms too) gets the floor material
 
 
 class Dungeon:
@@ -10,9 +28,13 @@ class Dungeon:
         self.min_room_size = 5
         self.max_room_size = 15
         self.num_rooms = None
+        self.max_placement_attempts = 200  # rejected rooms in a row before the fallback kicks in
+        self.placement_fallback = 'shrink'  # 'shrink' the rooms or 'stop' placing them
+        self.extra_connections = 0  # corridors on top of the ones needed to connect every room, these make loops
         self.min_rooms = 10
         self.max_rooms = 15
         self.map = None
+        self.flags = None
         self.rooms = None
         self.first_room = None
         self.last_room = None
@@ -22,72 +44,45 @@ class Dungeon:
         self.light = 0
 
     def generate(self):
-        self.map = []
         self.rooms = []
         self.first_room = None
         self.last_room = None
         self.connected = []
 
-        # build out the initial 2d array
-        for y in range(self.y_size):
-            # initialize each row
-            self.map.append([])
-            for x in range(self.x_size):
-                self.map[y].append({})
-                self.map[y][x]['t'] = 0
-                self.map[y][x]['path'] = False
-                self.map[y][x]['pos'] = {
-                    'x': x,
-                    'y': y
-                }
-                if self.light == 0:
-                    self.map[y][x]['r'] = 1
-                else:
-                    self.map[y][x] = 0
+        # build out the initial 2d grid of tile types and per cell flags
+        self.map = new_tile_grid(self.x_size, self.y_size)
+        self.flags = new_flag_grid(self.x_size, self.y_size, render=self.light == 0)
         self.num_rooms = get_random_int(self.min_rooms, self.max_rooms)
-        i = 0
-        while i < self.num_rooms:
-            room = {}
-            room['x'] = get_random_int(1, (self.x_size - self.max_room_size - 1))
-            room['y'] = get_random_int(1, (self.y_size - self.max_room_size - 1))
-            room['w'] = get_random_int(self.min_room_size, self.max_room_size)
-            room['h'] = get_random_int(self.min_room_size, self.max_room_size)
-            room['c'] = False
-            if self.does_collide(room):
-                continue
-            room['w'] -= 1
-            room['h'] -= 1
-            self.rooms.append(room)
-            i += 1
+        # rooms get placed with a spatial hash and a bounded number of retries, so crowded maps can not hang
+        self.rooms = place_rooms(self.num_rooms, self.random_room, self.min_room_size, self.max_room_size,
+                                 self.max_placement_attempts, self.placement_fallback)
+        if len(self.rooms) < self.num_rooms:
+            print(f'could only place {len(self.rooms)} of {self.num_rooms} rooms')
+            self.num_rooms = len(self.rooms)
         self.shrink_map(0)
-        for k in range(len(self.rooms)):
-            room = self.rooms[k]
-            closest_room = self.find_closest(room, self.connected)
-            if closest_room is None:
-                break
-            self.connect_rooms(room, closest_room, True)
-        for k in range(len(self.rooms)):
-            room = self.rooms[k]
-            for y in range(room['y'], room['y'] + room['h']):
-                for x in range(room['x'], room['x'] + room['w']):
-                    self.map[y][x]['t'] = 1
+        # corridors follow a minimum spanning tree over the room centers plus a few optional loops,
+        # which guarantees that every room can be reached
+        for room_index, other_index in connection_edges(self.rooms, self.extra_connections):
+            self.connect_rooms(self.rooms[other_index], self.rooms[room_index], True)
+        for room in self.rooms:
+            fill_room(self.map, room)
         # this part builds the walls
-        for y in range(self.y_size):
-            for x in range(self.x_size):
-                if self.map[y][x]['t'] == 1:
-                    yy = y - 1
-                    while yy <= y + 1:
-                        xx = x - 1
-                        while xx <= x+1:
-                            if self.map[yy][xx]['t'] == 0:
-                                self.map[yy][xx]['t'] = 2
-                            xx += 2
-                        yy += 2
+        build_wall_ring(self.map)
 
         self.find_farthest()
         self.mark_stairs()
         self.place_geometry()
 
+    # draws a random room with sides from min_room_size up to max_size, the placement is not checked here
+    def random_room(self, max_size):
+        room = {}
+        room['x'] = get_random_int(1, (self.x_size - self.max_room_size - 1))
+        room['y'] = get_random_int(1, (self.y_size - self.max_room_size - 1))
+        room['w'] = get_random_int(self.min_room_size, max_size)
+        room['h'] = get_random_int(self.min_room_size, max_size)
+        room['c'] = False
+        return room
+
     def does_collide(self, room):
         for i in range(len(self.rooms)):
             comparison_room = self.rooms[i]
@@ -101,7 +96,7 @@ class Dungeon:
         return False
 
     def point_collide(self, x, y):
-        if self.map[x][y]['t'] == 1:
+        if self.map[x, y] == FLOOR:
             return False
         return True
 
@@ -120,57 +115,11 @@ class Dungeon:
                         room['y'] += 1
                     continue
 
-    def find_closest(self, room, others=None):
-        master_room = {'x': room['x'] + room['w'] / 2,
-                       'y': room['y'] + room['h'] / 2
-                       }
-        room_min = 1000
-        final_room = None
-        for i in range(len(self.rooms)):
-            comparison_room = self.rooms[i]
-            if room == comparison_room:
-                continue
-            if others is not None:
-                is_closest = False
-                for j in range(len(others)):
-                    if comparison_room == others[j]:
-                        is_closest = True
-                        break
-                if is_closest:
-                    continue
-            room_avg = {
-                'x': comparison_room['x'] + comparison_room['w'] / 2,
-                'y': comparison_room['y'] + comparison_room['h'] / 2
-            }
-            room_calc = abs(room_avg['x'] - master_room['x']) + abs(room_avg['y'] - master_room['y'])
-            if room_calc < room_min:
-                room_min = room_calc
-                final_room = comparison_room
-        return final_room
-
+    # the two rooms whose centers are the farthest apart get the start and the end
     def find_farthest(self):
-        room_pair = []
-        swap_room = 0
-        for i in range(len(self.rooms)):
-            room = self.rooms[i]
-            midA = {
-                'x': room['x'] + room['w'] / 2,
-                'y': room['y'] + room['h'] / 2
-            }
-            for j in range(len(self.rooms)):
-                if i == j:
-                    continue
-                closest_room = self.rooms[j]
-                midB = {
-                    'x': closest_room['x'] + closest_room['w'] / 2,
-                    'y': closest_room['y'] + closest_room['h'] /2
-                }
-                math_room = abs(midB['x'] - midA['x']) + abs(midB['y'] - midA['y'])
-                if math_room > swap_room:
-                    swap_room = math_room
-                    room_pair = [room, closest_room]
-        self.first_room = room_pair[0]
-        self.last_room = room_pair[1]
+        first_index, last_index = farthest_pair(room_centers(self.rooms))
+        self.first_room = self.rooms[first_index]
+        self.last_room = self.rooms[last_index]
 
     def connect_rooms(self, room, closest_room, good):
         path_part_1 = {
@@ -181,20 +130,8 @@ class Dungeon:
             'x': get_random_int(closest_room['x'], closest_room['x'] + closest_room['w']),
             'y': get_random_int(closest_room['y'], closest_room['y'] + closest_room['h'])
         }
-        while path_part_1['x'] != path_part_2['x'] or path_part_1['y'] != path_part_2['y']:
-            if path_part_1["x"] != path_part_2["x"]:
-                if path_part_2["x"] < path_part_1["x"]:
-                    path_part_2["x"] += 1
-                else:
-                    path_part_2["x"] -= 1
-            else:
-                if path_part_1["y"] != path_part_2["y"]:
-                    if path_part_2["y"] < path_part_1["y"]:
-                        path_part_2["y"] += 1
-                    else:
-                        path_part_2["y"] -= 1
-
-            self.map[path_part_2['y']][path_part_2['x']]['t'] = 1
+        # the corridor runs from the second room to the first one, along x first and then along y
+        carve_corridor(self.map, path_part_2['x'], path_part_2['y'], path_part_1['x'], path_part_1['y'])
         if good:
             room['c'] = True
             closest_room['c'] = True
@@ -213,46 +150,44 @@ class Dungeon:
                 'y': get_random_int(self.last_room['y'] + 1, self.last_room['y'] + self.last_room['h'] - 1)
             }
         }
-        self.map[self.stairs_up["pos"]["y"]][self.stairs_up["pos"]["x"]]["t"] = 3
-        self.map[self.stairs_down["pos"]["y"]][self.stairs_down["pos"]["x"]]["t"] = 4
+        self.map[self.stairs_up["pos"]["y"], self.stairs_up["pos"]["x"]] = STAIRS_UP
+        self.map[self.stairs_down["pos"]["y"], self.stairs_down["pos"]["x"]] = STAIRS_DOWN
 
+    # the walls and floor tiles all go into one mesh, the start and end markers stay separate primitives
     def place_geometry(self):
-        yy = 0
-        for y in range(self.y_size):
-            xx = 0
-            for x in range(self.x_size):
-                if self.map[y][x]['t'] == 0 or self.map[y][x]['r'] == 0:  # these are not part of the maze body
-                    pass
-                elif self.map[y][x]['t'] == 2:
-                    # these are the walls
-                    bpy.ops.mesh.primitive_cube_add(size=2, enter_editmode=False, location=(xx, yy, 0))
-                elif self.map[y][x]['t'] == 3:
-                    # this is the beginning
-                    bpy.ops.mesh.primitive_uv_sphere_add(radius=1, enter_editmode=False, location=(xx, yy, 0))
-                elif self.map[y][x]['t'] == 4:
-                    # this is the end
-                    bpy.ops.mesh.primitive_cylinder_add(radius=1, enter_editmode=False, location=(xx, yy, 0))
-                else:
-                    # these are the floor tiles,
-                    bpy.ops.mesh.primitive_plane_add(size=2, enter_editmode=False, location=(xx, yy, -1))
-                xx += 2
-            yy += 2
+        # empty cells and cells that are not rendered are not part of the maze body
+        rendered = (self.map != EMPTY) & ((self.flags & RENDER) != 0)
+        for y, x in zip(*np.nonzero(rendered & (self.map == STAIRS_UP))):
+            # this is the beginning
+            bpy.ops.mesh.primitive_uv_sphere_add(radius=1, enter_editmode=False, location=(int(x) * 2, int(y) * 2, 0))
+        for y, x in zip(*np.nonzero(rendered & (self.map == STAIRS_DOWN))):
+            # this is the end
+            bpy.ops.mesh.primitive_cylinder_add(radius=1, enter_editmode=False, location=(int(x) * 2, int(y) * 2, 0))
+        builder = mesh_builder.BatchMeshBuilder()
+        if GREEDY_MESH:
+            # the walls' outer shell and the floor, each merged into as few rectangles as possible
+            builder.add_grid_shell(rendered & (self.map == WALL), greedy=True)
+            builder.add_grid_planes(rendered & (self.map == FLOOR), z=FLOOR_Z, greedy=True)
+            print(f'greedy meshing: {builder.unmerged_face_count} faces -> {builder.face_count}')
+        else:
+            # these are the walls
+            wall_y, wall_x = np.nonzero(rendered & (self.map == WALL))
+            builder.add_cubes(np.column_stack((wall_x, wall_y)) * 2)
+            # these are the floor tiles
+            floor_y, floor_x = np.nonzero(rendered & (self.map == FLOOR))
+            builder.add_planes(np.column_stack((floor_x, floor_y)) * 2, z=FLOOR_Z)
+        # to_object gives it world aligned UVs, one texture repeat per tile like the primitives had
+        builder.to_object('Cube')
 
 
 def get_random_int(low, high):
     return randint(low, high-1)
 
 
-def separate_the_floor(ob, floor_mat_index):
-    bpy.ops.object.mode_set(mode='EDIT')
-    # make sure there is only one object in the scene, else figure out a better way to get the object.
-    mesh = bmesh.from_edit_mesh(bpy.context.object.data)
-    bpy.ops.mesh.select_all(action='DESELECT')
-    for f in mesh.faces:
-        if f.calc_center_median()[2] == -1:
-            f.select = True
-            ob.active_material_index = floor_mat_index
-            bpy.ops.object.material_slot_assign()
+# Gives every face the material slot of the tile it sits on (see TILE_MATERIALS) in one pass over the mesh,
+# instead of assigning the floor faces one material_slot_assign at a time. Faces at FLOOR_Z count as floor tiles.
+def separate_the_floor(ob, tiles, tile_materials=TILE_MATERIALS):
+    mesh_builder.assign_tile_materials(ob.data, tiles, tile_materials, floor_z=FLOOR_Z, floor_tile=FLOOR)
 
 
 def append_material(directory, filepath, material_name):
@@ -322,4 +257,4 @@ if __name__ == '__main__':
         ob = bpy.data.objects[0]
         assign_material(ob, 'castlebrick')
         assign_material(ob, 'cobblestone')
-        separate_the_floor(ob, 1)
+        separate_the_floor(ob, dungeon.map)
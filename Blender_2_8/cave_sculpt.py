@@ -0,0 +1,251 @@
+'''
+Author: Aaron J. Olson
+https://aaronjolson.io
+
+Turns a level mesh into a cave, without operators or a 3D view, so it also works under blender --background.
+
+bake_cave bakes the look straight into the mesh: the wall faces get subdivided to a target edge length (instead of
+4 levels over every face), the floors and ceilings only where walls close them in on 3 or 4 sides. Then the vertices
+are pushed around by seeded NumPy fBm noise (see cave_noise.py) and written back as plain geometry. The same seed
+gives the same cave, and there is no modifier stack left to evaluate.
+add_cave_modifiers sets up the original Subdivision + three Displace modifier stack instead.
+'''
+
+import math
+import time
+
+import bpy
+import bmesh
+import numpy as np
+
+import cave_noise
+
+EDGE_LENGTH = 0.25  # target length of the wall edges after subdividing, smaller gives more detail and more faces
+SMOOTHING_PASSES = 2  # rounds off the block corners a little before the noise goes on, like the Subdivision modifier
+WALL_NORMAL_Z = 0.5  # faces whose normal points less up or down than this count as walls
+# (direction, strength, noise scale) of each displacement, the same as the Displace modifiers in cavify
+DISPLACEMENTS = (('X', 0.7, 0.75), ('Y', 0.6, 0.75), ('NORMAL', 0.2, 0.65))
+# the modifier version cuts the walls once around before subdividing, this far up from the middle of the 2 high cubes
+# (the edge slide value of the loop cut it used to make)
+LOOP_CUT_HEIGHT = 0.637373
+BUDGET_SEARCH_STEPS = 30  # halvings of the edge length range when looking for the shortest one that fits a budget
+
+
+# Cuts every face the horizontal plane at height crosses, which puts an edge loop around all of the walls.
+# Stands in for the loop cut operator, which only runs with a 3D view to work in.
+def cut_walls(bm, height=LOOP_CUT_HEIGHT):
+    geometry = bm.verts[:] + bm.edges[:] + bm.faces[:]
+    bmesh.ops.bisect_plane(bm, geom=geometry, dist=0.0001, plane_co=(0, 0, height), plane_no=(0, 0, 1))
+
+
+# the faces that stand up
+def wall_faces(bm):
+    return [face for face in bm.faces if abs(face.normal.z) < WALL_NORMAL_Z]
+
+
+# how many cuts split edges of these lengths into equal pieces no longer than edge_length
+def edge_cuts(lengths, edge_length):
+    # the small tolerance keeps an edge that is exactly a few pieces long from picking up one more cut
+    return np.maximum(np.ceil(np.asarray(lengths, dtype=np.float64) / edge_length - 0.000001) - 1, 0).astype(np.int64)
+
+
+# Roughly how the mesh grows as the wall edges get cut down to a given edge length, as a (triangles, vertices) function
+# of the edge length. Grid filled wall quads become (cuts + 1) x (cuts + 1) quads for the cuts of two neighboring
+# sides, every other face only gains the new vertices along its wall edges. subdivide_edges also fills the floor or
+# ceiling quads that have 3 or 4 wall edges (dead ends, lone wall blocks), which this leaves out, so it is only a first
+# guess that subdivide_walls checks against the real result.
+def subdivided_size(bm, walls, wall_edges):
+    edge_lengths = np.array([edge.calc_length() for edge in wall_edges])
+    wall_edges = set(wall_edges)
+    walls = set(walls)
+    quad_sides = []  # lengths of two neighboring sides of each wall quad
+    triangles = 0  # before cutting, of everything but the wall quads
+    cut_lengths = []  # lengths of the wall edges of those faces, every cut on them adds a triangle
+    for face in bm.faces:
+        sides = len(face.verts)
+        if face in walls and sides == 4:
+            quad_sides.append((face.edges[0].calc_length(), face.edges[1].calc_length()))
+            continue
+        triangles += sides - 2
+        cut_lengths.extend(edge.calc_length() for edge in face.edges if edge in wall_edges)
+    quad_sides = np.array(quad_sides, dtype=np.float64).reshape(-1, 2)
+
+    def size(edge_length):
+        first_cuts = edge_cuts(quad_sides[:, 0], edge_length)
+        second_cuts = edge_cuts(quad_sides[:, 1], edge_length)
+        return (triangles + int(edge_cuts(cut_lengths, edge_length).sum())
+                + 2 * int(((first_cuts + 1) * (second_cuts + 1)).sum()),
+                len(bm.verts) + int(edge_cuts(edge_lengths, edge_length).sum()) + int((first_cuts * second_cuts).sum()))
+    return size
+
+
+# The shortest edge length, from edge_length up to longest (where nothing gets cut), whose estimated size fits.
+def edge_length_for_budget(size, edge_length, longest, max_triangles=None, max_vertices=None):
+    if fits_budget(*size(edge_length), max_triangles, max_vertices):
+        return edge_length
+    low, high = edge_length, longest
+    for _ in range(BUDGET_SEARCH_STEPS):
+        middle = (low + high) / 2
+        if fits_budget(*size(middle), max_triangles, max_vertices):
+            high = middle
+        else:
+            low = middle
+    return high
+
+
+# None means no limit
+def fits_budget(triangles, vertices, max_triangles=None, max_vertices=None):
+    return (max_triangles is None or triangles <= max_triangles) and (max_vertices is None or vertices <= max_vertices)
+
+
+# (triangles, vertices) of a bmesh, counting every face as split into triangles
+def bmesh_size(bm):
+    return sum(len(face.verts) - 2 for face in bm.faces), len(bm.verts)
+
+
+# Cuts every edge of the wall faces into equal pieces no longer than edge_length, with a grid fill across the faces.
+# subdivide_edges takes one number of cuts per call, so the edges go in groups with the same cuts, most cuts first.
+# Cutting two opposite sides of a wall joins them with new edges across the face, those go into the later groups
+# together with the other two sides, so a long wall still ends up a grid.
+def cut_wall_edges(bm, edge_length):
+    bm.normal_update()
+    pending = list({edge for face in wall_faces(bm) for edge in face.edges})
+    while pending:
+        pending_cuts = edge_cuts([edge.calc_length() for edge in pending], edge_length)
+        cuts = int(pending_cuts.max())
+        if cuts <= 0:
+            break
+        group = [edge for edge, edge_cut in zip(pending, pending_cuts) if edge_cut == cuts]
+        result = bmesh.ops.subdivide_edges(bm, edges=group, cuts=cuts, use_grid_fill=True)
+        bm.normal_update()
+        pending = [edge for edge, edge_cut in zip(pending, pending_cuts) if edge_cut < cuts]
+        pending.extend(element for element in result['geom_inner'] if isinstance(element, bmesh.types.BMEdge)
+                       and any(abs(face.normal.z) < WALL_NORMAL_Z for face in element.link_faces))
+    bm.normal_update()
+
+
+# Cuts the edges of the wall faces so none of them end up longer than edge_length, with a grid fill across each face.
+# With a budget the edge length is first raised until the estimate from subdivided_size fits, then tried on a copy and
+# measured, and raised again until the real result fits (or nothing is cut any more, a mesh that is over budget to
+# begin with stays as it is). Returns the subdivided bmesh, which is a new one when there is a budget (bm is freed).
+def subdivide_walls(bm, edge_length=EDGE_LENGTH, max_triangles=None, max_vertices=None):
+    bm.normal_update()
+    walls = wall_faces(bm)
+    edges = list({edge for face in walls for edge in face.edges})
+    if not edges:
+        return bm
+    if max_triangles is None and max_vertices is None:
+        cut_wall_edges(bm, edge_length)
+        return bm
+    longest = max(edge.calc_length() for edge in edges)
+    edge_length = edge_length_for_budget(subdivided_size(bm, walls, edges), edge_length, longest,
+                                         max_triangles, max_vertices)
+    while True:
+        subdivided = bm.copy()
+        cut_wall_edges(subdivided, edge_length)
+        triangles, vertices = bmesh_size(subdivided)
+        if edge_length >= longest or fits_budget(triangles, vertices, max_triangles, max_vertices):
+            bm.free()
+            return subdivided
+        subdivided.free()
+        # both counts grow about with 1 / edge_length^2, scale it up by how far over the budget they went
+        overshoot = max(triangles / (max_triangles or triangles), vertices / (max_vertices or vertices))
+        edge_length = min(edge_length * max(math.sqrt(overshoot), 1.01), longest)
+
+
+# triangles the mesh has once every polygon is split into triangles
+def triangle_count(mesh):
+    return len(mesh.loops) - 2 * len(mesh.polygons)
+
+
+# Highest Subdivision modifier level, up to max_levels, whose result stays in the budgets, and the triangles it makes.
+# Catmull-Clark turns an n sided face into n quads on the first level and every quad into 4 on each level after that,
+# and a closed quad mesh has about as many vertices as faces.
+def subdivision_levels(mesh, max_triangles=None, max_vertices=None, max_levels=4):
+    sides = np.empty(len(mesh.polygons), dtype=np.int64)
+    mesh.polygons.foreach_get('loop_total', sides)
+    for levels in range(max_levels, 0, -1):
+        quads = int(sides.sum()) * 4 ** (levels - 1)
+        if (max_triangles is None or 2 * quads <= max_triangles) and (max_vertices is None or quads <= max_vertices):
+            return levels, 2 * quads
+    return 0, triangle_count(mesh)
+
+
+# pushes every vertex of the mesh along the DISPLACEMENTS, each one with its own seed so they do not move together
+def displace_vertices(mesh, seed=0):
+    count = len(mesh.vertices)
+    coordinates = np.empty(count * 3, dtype=np.float64)
+    normals = np.empty(count * 3, dtype=np.float64)
+    mesh.vertices.foreach_get('co', coordinates)
+    mesh.vertices.foreach_get('normal', normals)
+    coordinates = coordinates.reshape(-1, 3)
+    normals = normals.reshape(-1, 3)
+
+    offsets = np.zeros_like(coordinates)
+    for index, (direction, strength, scale) in enumerate(DISPLACEMENTS):
+        noise = strength * cave_noise.fbm(coordinates, seed=seed + index, scale=scale)
+        if direction == 'NORMAL':
+            offsets += noise[:, None] * normals
+        else:
+            offsets[:, 'XYZ'.index(direction)] += noise
+    mesh.vertices.foreach_set('co', (coordinates + offsets).ravel())
+    mesh.update()
+
+
+# Subdivides, smooths, flips and displaces the mesh of ob (which has to be in object mode) in place.
+# max_triangles and max_vertices cap the size of the result by subdividing less, None leaves that one unlimited.
+def bake_cave(ob, edge_length=EDGE_LENGTH, seed=0, smoothing=SMOOTHING_PASSES, max_triangles=None, max_vertices=None):
+    start_time = time.perf_counter()
+    mesh = ob.data
+    bm = bmesh.new()
+    bm.from_mesh(mesh)
+    bm = subdivide_walls(bm, edge_length, max_triangles, max_vertices)
+    wall_verts = list({vert for face in wall_faces(bm) for vert in face.verts})
+    for _ in range(smoothing):
+        bmesh.ops.smooth_vert(bm, verts=wall_verts, factor=0.5, use_axis_x=True, use_axis_y=True, use_axis_z=True)
+    # the cave is seen from the inside, so the normals point inwards (the flip_normals of the modifier version)
+    bmesh.ops.reverse_faces(bm, faces=bm.faces[:])
+    bm.to_mesh(mesh)
+    bm.free()
+    displace_vertices(mesh, seed)
+    print(f'baked cave: {len(mesh.vertices)} vertices (budget {max_vertices}), {triangle_count(mesh)} triangles '
+          f'(budget {max_triangles}) in {time.perf_counter() - start_time:.3f}s')
+
+
+# adds a Displace modifier to ob driven by texture, pushing along direction ('X', 'Y', 'Z' or 'NORMAL')
+def add_displace(ob, texture, direction, strength):
+    modifier = ob.modifiers.new('Displace', 'DISPLACE')
+    modifier.texture = texture
+    modifier.direction = direction
+    modifier.strength = strength
+    return modifier
+
+
+# The Subdivision + three Displace modifier version of the cave, set up through the data API alone (no operators,
+# no context override), so it also runs under blender --background. Cuts the walls, flips the normals, and picks the
+# subdivision level from the budgets. Returns the level and the triangles it makes.
+def add_cave_modifiers(ob, max_triangles=None, max_vertices=None):
+    mesh = ob.data
+    bm = bmesh.new()
+    bm.from_mesh(mesh)
+    cut_walls(bm)
+    bmesh.ops.reverse_faces(bm, faces=bm.faces[:])
+    bm.to_mesh(mesh)
+    bm.free()
+    mesh.update()
+
+    levels, triangles = subdivision_levels(mesh, max_triangles, max_vertices)
+    subdivision = ob.modifiers.new('Subdivision', 'SUBSURF')
+    subdivision.levels = levels
+
+    texture = bpy.data.textures.new('Texture', 'STUCCI')
+    texture.noise_scale = 0.75
+    texture.turbulence = 10
+    add_displace(ob, texture, 'X', 0.7)
+    texture = bpy.data.textures.new('Texture', 'STUCCI')
+    texture.noise_scale = 0.75
+    add_displace(ob, texture, 'Y', 0.6)
+    texture = bpy.data.textures.new('Texture', 'CLOUDS')
+    texture.noise_scale = 0.65
+    add_displace(ob, texture, 'NORMAL', 0.20)
+    return levels, triangles
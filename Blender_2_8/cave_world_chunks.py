@@ -0,0 +1,90 @@
+'''
+Author: Aaron J. Olson
+https://aaronjolson.io
+
+Chunked generation of an unbounded cellular automata cave world.
+Any (chunk_x, chunk_y) tile can be produced on demand without generating its neighbors,
+and tiles generated separately line up seamlessly.
+
+Every chunk owns the starting noise of its cells, drawn from a seed derived from the world seed and the chunk
+coordinates. To run the game of life for a chunk, the starting noise of a halo NUMBER_OF_ITERATIONS cells deep
+around it is rebuilt from the neighboring chunks' seeds (cheap, no simulation). Each iteration only the cells whose
+full ring of neighbors is known get updated, so the halo shrinks by one cell per iteration and what is left at the
+end is exactly the chunk, identical to what a single huge map would hold there.
+The world has no edges, so there is no "out of bounds counts as alive" rule here.
+'''
+
+import hashlib
+import time
+
+import numpy as np
+
+from cellular_automata_engine import apply_rules, count_padded_neighbors
+
+CHANCE_TO_START_ALIVE = 0.40
+DEATH_LIMIT = 3
+BIRTH_LIMIT = 4
+NUMBER_OF_ITERATIONS = 6
+CHUNK_SIZE = 64  # width and height of a chunk in cells
+WORLD_SEED = 1337
+
+
+# derives a stable 32 bit seed for a chunk (what RandomState takes), the same on every machine and every run
+def chunk_seed(world_seed, chunk_x, chunk_y):
+    key = f'{world_seed}:{chunk_x}:{chunk_y}'.encode()
+    return int.from_bytes(hashlib.blake2b(key, digest_size=4).digest(), 'little')
+
+
+# the starting noise of a single chunk, before any game of life iterations
+def chunk_noise(world_seed, chunk_x, chunk_y, chunk_size=CHUNK_SIZE, chance_to_start_alive=CHANCE_TO_START_ALIVE):
+    # RandomState rather than default_rng, the NumPy that ships with the older 2.8x releases does not have the latter
+    rng = np.random.RandomState(chunk_seed(world_seed, chunk_x, chunk_y))
+    return rng.random_sample((chunk_size, chunk_size)) < chance_to_start_alive
+
+
+# stitches together the starting noise for any rectangle of world cells, (x, y) being its top left cell
+def region_noise(world_seed, x, y, width, height, chunk_size=CHUNK_SIZE, chance_to_start_alive=CHANCE_TO_START_ALIVE):
+    region = np.empty((height, width), dtype=bool)
+    for chunk_y in range(y // chunk_size, (y + height - 1) // chunk_size + 1):
+        for chunk_x in range(x // chunk_size, (x + width - 1) // chunk_size + 1):
+            noise = chunk_noise(world_seed, chunk_x, chunk_y, chunk_size, chance_to_start_alive)
+            # overlap between this chunk and the requested rectangle, in world cells
+            top = max(y, chunk_y * chunk_size)
+            bottom = min(y + height, (chunk_y + 1) * chunk_size)
+            left = max(x, chunk_x * chunk_size)
+            right = min(x + width, (chunk_x + 1) * chunk_size)
+            region[top - y:bottom - y, left - x:right - x] = \
+                noise[top - chunk_y * chunk_size:bottom - chunk_y * chunk_size,
+                      left - chunk_x * chunk_size:right - chunk_x * chunk_size]
+    return region
+
+
+# runs the game of life for any rectangle of world cells, reading a halo of number_of_iterations cells around it
+def generate_region(world_seed, x, y, width, height, number_of_iterations=NUMBER_OF_ITERATIONS,
+                    chunk_size=CHUNK_SIZE, chance_to_start_alive=CHANCE_TO_START_ALIVE,
+                    death_limit=DEATH_LIMIT, birth_limit=BIRTH_LIMIT):
+    halo = number_of_iterations
+    cellmap = region_noise(world_seed, x - halo, y - halo, width + 2 * halo, height + 2 * halo,
+                           chunk_size, chance_to_start_alive)
+    for i in range(number_of_iterations):
+        # the outermost ring is missing neighbors, only the cells inside of it are updated and kept
+        cellmap = apply_rules(cellmap[1:-1, 1:-1], count_padded_neighbors(cellmap), death_limit, birth_limit)
+    return cellmap
+
+
+def generate_chunk(world_seed, chunk_x, chunk_y, number_of_iterations=NUMBER_OF_ITERATIONS,
+                   chunk_size=CHUNK_SIZE, chance_to_start_alive=CHANCE_TO_START_ALIVE,
+                   death_limit=DEATH_LIMIT, birth_limit=BIRTH_LIMIT):
+    return generate_region(world_seed, chunk_x * chunk_size, chunk_y * chunk_size, chunk_size, chunk_size,
+                           number_of_iterations, chunk_size, chance_to_start_alive, death_limit, birth_limit)
+
+
+if __name__ == '__main__':
+    start = time.perf_counter()
+    chunks = {(chunk_x, chunk_y): generate_chunk(WORLD_SEED, chunk_x, chunk_y)
+              for chunk_y in range(-2, 2) for chunk_x in range(-2, 2)}
+    print(f'16 chunks of {CHUNK_SIZE}x{CHUNK_SIZE}: {time.perf_counter() - start:.3f}s')
+    # the same area generated in one go has to match the chunks cell for cell
+    whole = generate_region(WORLD_SEED, -2 * CHUNK_SIZE, -2 * CHUNK_SIZE, 4 * CHUNK_SIZE, 4 * CHUNK_SIZE)
+    stitched = np.block([[chunks[(chunk_x, chunk_y)] for chunk_x in range(-2, 2)] for chunk_y in range(-2, 2)])
+    print(f'chunks seamless: {np.array_equal(whole, stitched)}')
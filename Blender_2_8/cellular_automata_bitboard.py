@@ -0,0 +1,135 @@
+'''
+Author: Aaron J. Olson
+https://aaronjolson.io
+
+Bit packed (bitboard) backend for the cellular automata / game of life cave generator.
+Every row of the map is stored as a single python int where bit i holds column i, so a cell costs one bit
+instead of a pointer to a bool object. Neighbor counts are done for a whole row at once with bit parallel
+adder logic, which lets huge caves (32k x 32k is ~128MB per map) be generated without running out of memory.
+
+Same rules as perform_game_of_life_iteration in cellular_automata_cave_maze.py:
+ - a live cell with fewer than DEATH_LIMIT live neighbors dies
+ - a dead cell with more than BIRTH_LIMIT live neighbors is born
+ - cells outside of the map always count as alive
+
+initialize_map draws its random numbers in the same order as the pure python scripts,
+so the same seed produces exactly the same cave.
+'''
+
+import random
+import time
+
+CHANCE_TO_START_ALIVE = 0.40
+DEATH_LIMIT = 3
+BIRTH_LIMIT = 4
+NUMBER_OF_ITERATIONS = 6
+WIDTH = 4096
+HEIGHT = WIDTH
+
+
+# builds the packed rows from a random stream, row by row and column by column like initialize_map in the scripts
+def initialize_map(width, height, chance_to_start_alive=CHANCE_TO_START_ALIVE, seed=None):
+    rng = random.Random(seed)
+    rows = []
+    for j in range(height):
+        # the string is written most significant bit first, so column 0 ends up last
+        bits = ['1' if rng.random() < chance_to_start_alive else '0' for i in range(width)]
+        rows.append(int(''.join(reversed(bits)), 2))
+    return rows
+
+
+# converts a list of lists level_map into packed rows
+def from_lists(level_map):
+    return [int(''.join('1' if cell else '0' for cell in reversed(row)), 2) for row in level_map]
+
+
+# converts packed rows back into the list of lists level_map used by the scripts
+def to_lists(rows, width):
+    return [[(row >> i) & 1 == 1 for i in range(width)] for row in rows]
+
+
+# returns the two bit sum (ones, twos) of three one bit inputs for every column at once
+def full_adder(a, b, c):
+    ones = a ^ b ^ c
+    twos = (a & b) | (a & c) | (b & c)
+    return ones, twos
+
+
+# returns a mask of the columns whose bit sliced count (list of bit planes, least significant first) is >= k
+def at_least(count_bits, k, full_mask):
+    if k >> len(count_bits):
+        return 0  # k is bigger than any count the bit planes can hold
+    greater = 0
+    equal = full_mask
+    for i in reversed(range(len(count_bits))):
+        if (k >> i) & 1:
+            equal &= count_bits[i]
+        else:
+            greater |= equal & count_bits[i]
+            equal &= full_mask ^ count_bits[i]
+    return greater | equal
+
+
+def perform_game_of_life_iteration(rows, width, death_limit=DEATH_LIMIT, birth_limit=BIRTH_LIMIT):
+    full_mask = (1 << width) - 1
+    high_bit = 1 << (width - 1)
+
+    # shifted copies of a row hold the left and right neighbor of every column,
+    # the bit shifted in from outside of the map is alive
+    def left_of(row):
+        return ((row << 1) | 1) & full_mask
+
+    def right_of(row):
+        return (row >> 1) | high_bit
+
+    # sum of the three cells (left, self, right) in a row, used for the rows above and below a cell
+    def horizontal_sum(row):
+        return full_adder(left_of(row), row, right_of(row))
+
+    outside = horizontal_sum(full_mask)  # rows past the top and bottom are all alive
+    new_rows = []
+    above = outside
+    current = horizontal_sum(rows[0])
+    for y in range(len(rows)):
+        below = horizontal_sum(rows[y + 1]) if y + 1 < len(rows) else outside
+        row = rows[y]
+        # the middle row contributes only the left and right neighbor, never the cell itself
+        left = left_of(row)
+        right = right_of(row)
+        middle_ones = left ^ right
+        middle_twos = left & right
+
+        # add the three two bit numbers together into a four bit count (0 - 8)
+        count_0, carry = full_adder(above[0], below[0], middle_ones)
+        twos_ones, twos_twos = full_adder(above[1], below[1], middle_twos)
+        count_1 = twos_ones ^ carry
+        carry = twos_ones & carry
+        count_2 = twos_twos ^ carry
+        count_3 = twos_twos & carry
+        count_bits = [count_0, count_1, count_2, count_3]
+
+        # live cells survive with at least death_limit neighbors, empty cells are born with more than birth_limit
+        survives = row & at_least(count_bits, death_limit, full_mask)
+        born = (full_mask ^ row) & at_least(count_bits, birth_limit + 1, full_mask)
+        new_rows.append(survives | born)
+
+        above = current
+        current = below
+    return new_rows
+
+
+def generate_map(width, height, number_of_iterations=NUMBER_OF_ITERATIONS, chance_to_start_alive=CHANCE_TO_START_ALIVE,
+                 death_limit=DEATH_LIMIT, birth_limit=BIRTH_LIMIT, seed=None, initial_map=None):
+    if initial_map is None:
+        rows = initialize_map(width, height, chance_to_start_alive, seed)
+    else:
+        rows = from_lists(initial_map)
+    for i in range(number_of_iterations):
+        rows = perform_game_of_life_iteration(rows, width, death_limit, birth_limit)
+    return rows
+
+
+if __name__ == '__main__':
+    start = time.perf_counter()
+    cave = generate_map(WIDTH, HEIGHT, seed=0)
+    print(f'{WIDTH}x{HEIGHT} bitboard cave, {NUMBER_OF_ITERATIONS} iterations: {time.perf_counter() - start:.3f}s')
@@ -8,11 +8,21 @@ Example of 3D model output
 https://sketchfab.com/3d-models/low-poly-procedural-cave-maze-environment-2b0ad5a175b5419ea560fa595e53e9f4
 '''
 
-import math
+import os
+import sys
 from random import random
 
 import bpy
 import bmesh
+import numpy as np
+
+# the helper modules live next to this script, make sure Blender can find them
+SCRIPT_DIRECTORY = os.path.dirname(os.path.abspath(__file__))
+if SCRIPT_DIRECTORY not in sys.path:
+    sys.path.append(SCRIPT_DIRECTORY)
+
+import cellular_automata_engine
+import mesh_builder
 
 CHANCE_TO_START_ALIVE = 0.40
 DEATH_LIMIT = 3
@@ -20,6 +30,9 @@ BIRTH_LIMIT = 4
 NUMBER_OF_ITERATIONS = 6  # number of times the game of life algorithm is run, consolidates mesh
 WIDTH = 40  # overall size of the maze to be generated, the higher, the bigger, but increases run time
 HEIGHT = WIDTH
+USE_NUMPY_ENGINE = True  # run the game of life on NumPy arrays, set to False for the pure python version
+DIRECT_MESH = True  # build only the exposed faces straight from the map, set to False for cubes + cleanup_mesh
+GREEDY_MESH = False  # merge coplanar faces into larger rectangles, far fewer faces for game engines
 
 
 def initialize_map():
@@ -82,16 +95,21 @@ def count_alive_neighbors(live_map, x, y):
     return count
 
 
-# adds cubes to the map based on the level_map matrix
+# adds cubes to the map based on the level_map matrix, all of them in one mesh
 def add_cubes(cell_map):
-    matrix_size = WIDTH
-    for i in range(matrix_size**2):
-        y = math.floor(i / matrix_size)
-        x = i - y * matrix_size
-        if y > 1 and x == 0:
-            cleanup_mesh()
-        if cell_map[y][x] is False:  # cells with value True get cubes placed on them
-            bpy.ops.mesh.primitive_cube_add(size=2, enter_editmode=False, location=(x*2, y*2, 0))
+    cube_y, cube_x = np.nonzero(~np.array(cell_map, dtype=bool))  # cells with value False get cubes placed on them
+    builder = mesh_builder.BatchMeshBuilder()
+    builder.add_cubes(np.column_stack((cube_x, cube_y)) * 2)
+    builder.to_object('Cube')
+
+
+# only the faces of add_cubes' cubes that cleanup_mesh would keep, built straight from the map
+def add_shell(cell_map):
+    builder = mesh_builder.BatchMeshBuilder()
+    builder.add_grid_shell(~np.array(cell_map, dtype=bool), greedy=GREEDY_MESH)
+    if GREEDY_MESH:
+        print(f'greedy meshing: {builder.unmerged_face_count} faces -> {builder.face_count}')
+    builder.to_object('Cube')
 
 
 # joins all separate objects into a single object,
@@ -133,6 +151,16 @@ def clear_scene():
 
 
 def generate_map():
+    if USE_NUMPY_ENGINE:
+        # only the cells near last iteration's changes are re-checked, stops early once the cave settles
+        cellmap, iterations_run = cellular_automata_engine.generate_map_incremental(
+            WIDTH, HEIGHT,
+            number_of_iterations=NUMBER_OF_ITERATIONS,
+            chance_to_start_alive=CHANCE_TO_START_ALIVE,
+            death_limit=DEATH_LIMIT,
+            birth_limit=BIRTH_LIMIT)
+        print(f'game of life needed {iterations_run} of {NUMBER_OF_ITERATIONS} iterations')
+        return cellular_automata_engine.to_list(cellmap)
     # Create a new level_map
     # Set up the level_map with random values
     cellmap = initialize_map()
@@ -145,5 +173,8 @@ def generate_map():
 if __name__ == '__main__':
     clear_scene()
     level_map = generate_map()
-    add_cubes(level_map)
-    cleanup_mesh()
+    if DIRECT_MESH:
+        add_shell(level_map)
+    else:
+        add_cubes(level_map)
+        cleanup_mesh()
@@ -8,10 +8,21 @@ Example of 3D model output
 https://sketchfab.com/3d-models/low-poly-procedural-cave-maze-environment-2b0ad5a175b5419ea560fa595e53e9f4
 '''
 
-import math
+import os
+import sys
 from random import random
 
 import bpy
+import numpy as np
+
+# the helper modules live next to this script, make sure Blender can find them
+SCRIPT_DIRECTORY = os.path.dirname(os.path.abspath(__file__))
+if SCRIPT_DIRECTORY not in sys.path:
+    sys.path.append(SCRIPT_DIRECTORY)
+
+import cellular_automata_engine
+import mesh_builder
+import occupancy_grid
 
 CHANCE_TO_START_ALIVE = 0.40  # The smaller this number is, the sparser the generated maze will be
 DEATH_LIMIT = 3
@@ -19,10 +30,8 @@ BIRTH_LIMIT = 4
 NUMBER_OF_ITERATIONS = 6  # number of times the game of life algorithm is run, consolidates mesh shape
 WIDTH = 40  # overall size of the maze to be generated, the higher, the bigger, but increases run time
 HEIGHT = WIDTH
-
-
-visited = []  # walkable tile
-walls = []
+USE_NUMPY_ENGINE = True  # run the game of life on NumPy arrays, set to False for the pure python version
+WALL_CONNECTIVITY = 4  # 4 only walls in the floor's edges, 8 also fills in the outside corners
 
 
 def initialize_map():
@@ -83,39 +92,30 @@ def count_alive_neighbors(live_map, x, y):
     return count
 
 
-# adds cubes to the map based on the level_map matrix
+# adds floor tiles to the map based on the level_map matrix
 def add_tiles(cell_map):
-    matrix_size = WIDTH
-    for i in range(matrix_size**2):
-        y = math.floor(i / matrix_size)
-        x = i - y * matrix_size
-        if cell_map[y][x] is False:  # cells with value True get cubes placed on them
-            place_tile(x*2, y*2)
-            visited.append((x*2, y*2))
-
-
-def place_cube(x, y):
-    bpy.ops.mesh.primitive_cube_add(size=2, enter_editmode=False, location=(x, y, 0))
+    tile_y, tile_x = np.nonzero(~np.array(cell_map, dtype=bool))  # cells with value False get tiles placed on them
+    place_tiles(np.column_stack((tile_x, tile_y)) * 2)
 
 
-def place_tile(x, y):
-    bpy.ops.mesh.primitive_plane_add(size=2, enter_editmode=False, location=(x, y, -1))
+# one cube per (x, y) position, all of them in a single object
+def place_cubes(positions):
+    builder = mesh_builder.BatchMeshBuilder()
+    builder.add_cubes(positions)
+    builder.to_object('Cube')
 
 
-def check_neighbors_and_place_wall(pos):
-    offset_map = [(pos[0] - 2.0, pos[1]),
-                  (pos[0] + 2.0, pos[1]),
-                  (pos[0], pos[1] - 2.0),
-                  (pos[0], pos[1] + 2.0)]
-    for offset_tuple in offset_map:
-        if offset_tuple not in visited and offset_map not in walls:
-            place_cube(offset_tuple[0], offset_tuple[1])
-            walls.append((offset_tuple[0], offset_tuple[1]))
+# one floor tile per (x, y) position, all of them in a single object
+def place_tiles(positions):
+    builder = mesh_builder.BatchMeshBuilder()
+    builder.add_planes(positions, z=-1)
+    builder.to_object('Plane')
 
 
-def build_walls():
-    for position in visited:
-        check_neighbors_and_place_wall(position)
+# every cell bordering the open floor that is not floor itself gets a wall cube, exactly once
+def build_walls(cell_map):
+    floor_y, floor_x = np.nonzero(~np.array(cell_map, dtype=bool))
+    place_cubes(occupancy_grid.wall_cells(np.column_stack((floor_x, floor_y)), WALL_CONNECTIVITY) * 2)
 
 
 # joins all separate objects into a single object and delete duplicate verts
@@ -143,6 +143,16 @@ def clear_scene():
 
 
 def generate_map():
+    if USE_NUMPY_ENGINE:
+        # only the cells near last iteration's changes are re-checked, stops early once the cave settles
+        cellmap, iterations_run = cellular_automata_engine.generate_map_incremental(
+            WIDTH, HEIGHT,
+            number_of_iterations=NUMBER_OF_ITERATIONS,
+            chance_to_start_alive=CHANCE_TO_START_ALIVE,
+            death_limit=DEATH_LIMIT,
+            birth_limit=BIRTH_LIMIT)
+        print(f'game of life needed {iterations_run} of {NUMBER_OF_ITERATIONS} iterations')
+        return cellular_automata_engine.to_list(cellmap)
     # Create a new level_map
     # Set up the level_map with random values
     cellmap = initialize_map()
@@ -157,5 +167,5 @@ if __name__ == '__main__':
     level_map = generate_map()
     add_tiles(level_map)
     cleanup_mesh()  # done here to give slight speedup by reducing the number of total objects in the scene
-    build_walls()
+    build_walls(level_map)
     cleanup_mesh()
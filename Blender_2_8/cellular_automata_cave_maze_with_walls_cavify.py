@@ -8,10 +8,22 @@ Example of 3D model output
 https://sketchfab.com/3d-models/low-poly-procedural-cave-maze-environment-2b0ad5a175b5419ea560fa595e53e9f4
 '''
 
-import math
+import os
+import sys
 from random import random
 
 import bpy
+import numpy as np
+
+# the helper modules live next to this script, make sure Blender can find them
+SCRIPT_DIRECTORY = os.path.dirname(os.path.abspath(__file__))
+if SCRIPT_DIRECTORY not in sys.path:
+    sys.path.append(SCRIPT_DIRECTORY)
+
+import cave_sculpt
+import cellular_automata_engine
+import mesh_builder
+import occupancy_grid
 
 CHANCE_TO_START_ALIVE = 0.40  # The smaller this number is, the sparser the generated maze will be
 DEATH_LIMIT = 3
@@ -19,10 +31,13 @@ BIRTH_LIMIT = 4
 NUMBER_OF_ITERATIONS = 6  # number of times the game of life algorithm is run, consolidates mesh shape
 WIDTH = 40  # overall size of the maze to be generated, the higher, the bigger, but increases run time
 HEIGHT = WIDTH
-
-
-visited = []  # walkable tile
-walls = []
+USE_NUMPY_ENGINE = True  # run the game of life on NumPy arrays, set to False for the pure python version
+WALL_CONNECTIVITY = 4  # 4 only walls in the floor's edges, 8 also fills in the outside corners
+CAVIFY_MODE = 'BAKED'  # 'BAKED' writes NumPy noise into the mesh, 'MODIFIERS' adds Subdivision + Displace
+CAVE_EDGE_LENGTH = 0.25  # wall edge length the baked mode subdivides down to
+CAVE_SEED = 0  # the baked noise is the same for the same seed
+TRIANGLE_BUDGET = 2000000  # cavify subdivides less to stay under this many triangles, None for no limit
+VERTEX_BUDGET = None  # same for the vertices
 
 
 def initialize_map():
@@ -83,39 +98,30 @@ def count_alive_neighbors(live_map, x, y):
     return count
 
 
-# adds cubes to the map based on the level_map matrix
+# adds floor tiles to the map based on the level_map matrix
 def add_tiles(cell_map):
-    matrix_size = WIDTH
-    for i in range(matrix_size**2):
-        y = math.floor(i / matrix_size)
-        x = i - y * matrix_size
-        if cell_map[y][x] is False:  # cells with value True get cubes placed on them
-            place_tile(x*2, y*2)
-            visited.append((x*2, y*2))
+    tile_y, tile_x = np.nonzero(~np.array(cell_map, dtype=bool))  # cells with value False get tiles placed on them
+    place_tiles(np.column_stack((tile_x, tile_y)) * 2)
 
 
-def place_cube(x, y):
-    bpy.ops.mesh.primitive_cube_add(size=2, enter_editmode=False, location=(x, y, 0))
+# one cube per (x, y) position, all of them in a single object
+def place_cubes(positions):
+    builder = mesh_builder.BatchMeshBuilder()
+    builder.add_cubes(positions)
+    builder.to_object('Cube')
 
 
-def place_tile(x, y):
-    bpy.ops.mesh.primitive_plane_add(size=2, enter_editmode=False, location=(x, y, -1))
+# one floor tile per (x, y) position, all of them in a single object
+def place_tiles(positions):
+    builder = mesh_builder.BatchMeshBuilder()
+    builder.add_planes(positions, z=-1)
+    builder.to_object('Plane')
 
 
-def check_neighbors_and_place_wall(pos):
-    offset_map = [(pos[0] - 2.0, pos[1]),
-                  (pos[0] + 2.0, pos[1]),
-                  (pos[0], pos[1] - 2.0),
-                  (pos[0], pos[1] + 2.0)]
-    for offset_tuple in offset_map:
-        if offset_tuple not in visited and offset_map not in walls:
-            place_cube(offset_tuple[0], offset_tuple[1])
-            walls.append((offset_tuple[0], offset_tuple[1]))
-
-
-def build_walls():
-    for position in visited:
-        check_neighbors_and_place_wall(position)
+# every cell bordering the open floor that is not floor itself gets a wall cube, exactly once
+def build_walls(cell_map):
+    floor_y, floor_x = np.nonzero(~np.array(cell_map, dtype=bool))
+    place_cubes(occupancy_grid.wall_cells(np.column_stack((floor_x, floor_y)), WALL_CONNECTIVITY) * 2)
 
 
 # joins all separate objects into a single object and delete duplicate verts
@@ -134,80 +140,15 @@ def cleanup_mesh():
     bpy.ops.object.editmode_toggle()
 
 
+# roughens the level up into a cave, baked into the mesh or with modifiers, neither needs a 3D view (runs headless)
 def cavify():
-    win = bpy.context.window
-    scr = win.screen
-    areas3d = [area for area in scr.areas if area.type == 'VIEW_3D']
-    region = [region for region in areas3d[0].regions if region.type == 'WINDOW']
-
-    override = {'window': win,
-                'screen': scr,
-                'area': areas3d[0],
-                'region': region[0],
-                'scene': bpy.context.scene,
-                }
-
-    bpy.ops.object.mode_set(mode='EDIT')
-    bpy.ops.mesh.loopcut_slide(
-        override,
-        MESH_OT_loopcut={
-            "number_cuts": 1,
-            "smoothness": 0,
-            "falloff": 'INVERSE_SQUARE',
-            "edge_index": 1,
-            "mesh_select_mode_init": (False, False, True)
-        },
-        TRANSFORM_OT_edge_slide={
-            "value": 0.637373,
-            "single_side": False,
-            "use_even": False,
-            "flipped": False,
-            "use_clamp": True,
-            "mirror": False,
-            "snap": False,
-            "snap_target": 'CLOSEST',
-            "snap_point": (0, 0, 0),
-            "snap_align": False,
-            "snap_normal": (0, 0, 0),
-            "correct_uv": False,
-            "release_confirm": False,
-            "use_accurate": False
-        }
-    )
-
-    # space and search for flip normals
-    bpy.ops.mesh.select_all(action='TOGGLE')
-    bpy.ops.mesh.flip_normals()
-    bpy.ops.object.modifier_add(type='SUBSURF')
-    bpy.context.object.modifiers["Subdivision"].levels = 4
-
-    # add the displacement modifiers
-    bpy.ops.object.modifier_add(type='DISPLACE')
-    bpy.ops.texture.new()
-    bpy.data.textures["Texture"].type = 'STUCCI'
-    bpy.data.textures["Texture"].noise_scale = 0.75
-    bpy.context.object.modifiers["Displace"].direction = 'X'
-    bpy.data.textures["Texture"].turbulence = 10
-    bpy.context.object.modifiers["Displace"].texture = bpy.data.textures["Texture"]
-
-    bpy.ops.object.modifier_add(type='DISPLACE')
-    bpy.ops.texture.new()
-    bpy.data.textures["Texture.001"].type = 'STUCCI'
-    bpy.data.textures["Texture.001"].noise_scale = 0.75
-    bpy.context.object.modifiers["Displace.001"].direction = 'Y'
-    bpy.context.object.modifiers["Displace.001"].texture = bpy.data.textures["Texture.001"]
-
-    bpy.ops.object.modifier_add(type='DISPLACE')
-    bpy.ops.texture.new()
-    bpy.data.textures["Texture.002"].type = 'CLOUDS'
-    bpy.data.textures["Texture.002"].noise_scale = 0.65
-    bpy.context.object.modifiers["Displace.002"].strength = 0.20
-    bpy.context.object.modifiers["Displace.002"].texture = bpy.data.textures["Texture.002"]
-
-    bpy.context.object.modifiers["Displace"].strength = 0.7
-    bpy.context.object.modifiers["Displace.001"].strength = 0.6
-
     bpy.ops.object.mode_set(mode='OBJECT')
+    if CAVIFY_MODE == 'BAKED':
+        cave_sculpt.bake_cave(bpy.context.object, CAVE_EDGE_LENGTH, CAVE_SEED,
+                              max_triangles=TRIANGLE_BUDGET, max_vertices=VERTEX_BUDGET)
+    else:
+        levels, triangles = cave_sculpt.add_cave_modifiers(bpy.context.object, TRIANGLE_BUDGET, VERTEX_BUDGET)
+        print(f'subdivision level {levels}: about {triangles} triangles (budget {TRIANGLE_BUDGET})')
 
 
 # delete everything in the scene
@@ -219,6 +160,16 @@ def clear_scene():
 
 
 def generate_map():
+    if USE_NUMPY_ENGINE:
+        # only the cells near last iteration's changes are re-checked, stops early once the cave settles
+        cellmap, iterations_run = cellular_automata_engine.generate_map_incremental(
+            WIDTH, HEIGHT,
+            number_of_iterations=NUMBER_OF_ITERATIONS,
+            chance_to_start_alive=CHANCE_TO_START_ALIVE,
+            death_limit=DEATH_LIMIT,
+            birth_limit=BIRTH_LIMIT)
+        print(f'game of life needed {iterations_run} of {NUMBER_OF_ITERATIONS} iterations')
+        return cellular_automata_engine.to_list(cellmap)
     # Create a new level_map
     # Set up the level_map with random values
     cellmap = initialize_map()
@@ -233,6 +184,6 @@ if __name__ == '__main__':
     level_map = generate_map()
     add_tiles(level_map)
     cleanup_mesh()  # done here to give slight speedup by reducing the number of total objects in the scene
-    build_walls()
+    build_walls(level_map)
     cleanup_mesh()
     cavify()
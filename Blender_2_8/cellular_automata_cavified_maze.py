@@ -8,11 +8,22 @@ Example of 3D model output
 https://sketchfab.com/3d-models/low-poly-procedural-cave-maze-environment-2b0ad5a175b5419ea560fa595e53e9f4
 '''
 
-import math
+import os
+import sys
 from random import random
 
 import bpy
 import bmesh
+import numpy as np
+
+# the helper modules live next to this script, make sure Blender can find them
+SCRIPT_DIRECTORY = os.path.dirname(os.path.abspath(__file__))
+if SCRIPT_DIRECTORY not in sys.path:
+    sys.path.append(SCRIPT_DIRECTORY)
+
+import cave_sculpt
+import cellular_automata_engine
+import mesh_builder
 
 CHANCE_TO_START_ALIVE = 0.38 # lower the number, tbe smaller the "gaps"3r
 DEATH_LIMIT = 3
@@ -20,6 +31,13 @@ BIRTH_LIMIT = 4
 NUMBER_OF_ITERATIONS = 6  # number of times the game of life algorithm is run, consolidates mesh
 WIDTH = 40  # overall size of the maze to be generated, the higher, the bigger, but increases run time
 HEIGHT = WIDTH
+USE_NUMPY_ENGINE = True  # run the game of life on NumPy arrays, set to False for the pure python version
+BATCH_FACES = 60000  # cube faces committed to the scene at a time, tune this with the printed batch timings
+CAVIFY_MODE = 'BAKED'  # 'BAKED' writes NumPy noise into the mesh, 'MODIFIERS' adds Subdivision + Displace
+CAVE_EDGE_LENGTH = 0.25  # wall edge length the baked mode subdivides down to
+CAVE_SEED = 0  # the baked noise is the same for the same seed
+TRIANGLE_BUDGET = 2000000  # cavify subdivides less to stay under this many triangles, None for no limit
+VERTEX_BUDGET = None  # same for the vertices
 
 
 def initialize_map():
@@ -82,16 +100,14 @@ def count_alive_neighbors(live_map, x, y):
     return count
 
 
-# adds cubes to the map based on the level_map matrix
+# adds cubes to the map based on the level_map matrix, row by row, in batches of BATCH_FACES faces
+# (one object per batch, cleanup_mesh joins, welds and culls them all once at the end)
 def add_cubes(cell_map):
-    matrix_size = WIDTH
-    for i in range(matrix_size**2):
-        y = math.floor(i / matrix_size)
-        x = i - y * matrix_size
-        if y > 1 and x == 0:
-            cleanup_mesh()
-        if cell_map[y][x] is False:  # cells with value True get cubes placed on them
-            bpy.ops.mesh.primitive_cube_add(size=2, enter_editmode=False, location=(x*2, y*2, 0))
+    stream = mesh_builder.StreamingMeshBuilder('Cube', BATCH_FACES)
+    for y, row in enumerate(cell_map):
+        cube_x = np.flatnonzero(~np.array(row, dtype=bool))  # cells with value False get cubes placed on them
+        stream.add_cubes(np.column_stack((cube_x * 2, np.full(len(cube_x), y * 2))))
+    stream.finish()
 
 
 # # joins all separate objects into a single object,
@@ -126,80 +142,15 @@ def cleanup_mesh():
     bpy.ops.object.mode_set(mode='OBJECT')
 
 
+# roughens the level up into a cave, baked into the mesh or with modifiers, neither needs a 3D view (runs headless)
 def cavify():
-    win = bpy.context.window
-    scr = win.screen
-    areas3d = [area for area in scr.areas if area.type == 'VIEW_3D']
-    region = [region for region in areas3d[0].regions if region.type == 'WINDOW']
-
-    override = {'window': win,
-                'screen': scr,
-                'area': areas3d[0],
-                'region': region[0],
-                'scene': bpy.context.scene,
-                }
-
-    bpy.ops.object.mode_set(mode='EDIT')
-    bpy.ops.mesh.loopcut_slide(
-        override,
-        MESH_OT_loopcut={
-            "number_cuts": 1,
-            "smoothness": 0,
-            "falloff": 'INVERSE_SQUARE',
-            "edge_index": 1,
-            "mesh_select_mode_init": (False, False, True)
-        },
-        TRANSFORM_OT_edge_slide={
-            "value": 0.637373,
-            "single_side": False,
-            "use_even": False,
-            "flipped": False,
-            "use_clamp": True,
-            "mirror": False,
-            "snap": False,
-            "snap_target": 'CLOSEST',
-            "snap_point": (0, 0, 0),
-            "snap_align": False,
-            "snap_normal": (0, 0, 0),
-            "correct_uv": False,
-            "release_confirm": False,
-            "use_accurate": False
-        }
-    )
-
-    # space and search for flip normals
-    bpy.ops.mesh.select_all(action='TOGGLE')
-    bpy.ops.mesh.flip_normals()
-    bpy.ops.object.modifier_add(type='SUBSURF')
-    bpy.context.object.modifiers["Subdivision"].levels = 4
-
-    # add the displacement modifiers
-    bpy.ops.object.modifier_add(type='DISPLACE')
-    bpy.ops.texture.new()
-    bpy.data.textures["Texture"].type = 'STUCCI'
-    bpy.data.textures["Texture"].noise_scale = 0.75
-    bpy.context.object.modifiers["Displace"].direction = 'X'
-    bpy.data.textures["Texture"].turbulence = 10
-    bpy.context.object.modifiers["Displace"].texture = bpy.data.textures["Texture"]
-
-    bpy.ops.object.modifier_add(type='DISPLACE')
-    bpy.ops.texture.new()
-    bpy.data.textures["Texture.001"].type = 'STUCCI'
-    bpy.data.textures["Texture.001"].noise_scale = 0.75
-    bpy.context.object.modifiers["Displace.001"].direction = 'Y'
-    bpy.context.object.modifiers["Displace.001"].texture = bpy.data.textures["Texture.001"]
-
-    bpy.ops.object.modifier_add(type='DISPLACE')
-    bpy.ops.texture.new()
-    bpy.data.textures["Texture.002"].type = 'CLOUDS'
-    bpy.data.textures["Texture.002"].noise_scale = 0.65
-    bpy.context.object.modifiers["Displace.002"].strength = 0.20
-    bpy.context.object.modifiers["Displace.002"].texture = bpy.data.textures["Texture.002"]
-
-    bpy.context.object.modifiers["Displace"].strength = 0.7
-    bpy.context.object.modifiers["Displace.001"].strength = 0.6
-
     bpy.ops.object.mode_set(mode='OBJECT')
+    if CAVIFY_MODE == 'BAKED':
+        cave_sculpt.bake_cave(bpy.context.object, CAVE_EDGE_LENGTH, CAVE_SEED,
+                              max_triangles=TRIANGLE_BUDGET, max_vertices=VERTEX_BUDGET)
+    else:
+        levels, triangles = cave_sculpt.add_cave_modifiers(bpy.context.object, TRIANGLE_BUDGET, VERTEX_BUDGET)
+        print(f'subdivision level {levels}: about {triangles} triangles (budget {TRIANGLE_BUDGET})')
 
 
 # delete everything in the scene
@@ -211,6 +162,16 @@ def clear_scene():
 
 
 def generate_map():
+    if USE_NUMPY_ENGINE:
+        # only the cells near last iteration's changes are re-checked, stops early once the cave settles
+        cellmap, iterations_run = cellular_automata_engine.generate_map_incremental(
+            WIDTH, HEIGHT,
+            number_of_iterations=NUMBER_OF_ITERATIONS,
+            chance_to_start_alive=CHANCE_TO_START_ALIVE,
+            death_limit=DEATH_LIMIT,
+            birth_limit=BIRTH_LIMIT)
+        print(f'game of life needed {iterations_run} of {NUMBER_OF_ITERATIONS} iterations')
+        return cellular_automata_engine.to_list(cellmap)
     # Create a new level_map
     # Set up the level_map with random values
     cellmap = initialize_map()
@@ -0,0 +1,156 @@
+'''
+Author: Aaron J. Olson
+https://aaronjolson.io
+
+NumPy backed cellular automata / game of life engine used by the cave generators.
+Works on whole boolean arrays at once instead of visiting every cell from Python,
+so big maps (2048x2048 and up) are generated in a fraction of a second.
+
+Follows the same rules as perform_game_of_life_iteration in cellular_automata_cave_maze.py:
+ - a live cell with fewer than DEATH_LIMIT live neighbors dies
+ - a dead cell with more than BIRTH_LIMIT live neighbors is born
+ - cells outside of the map always count as alive
+
+No Blender imports, so the module can be used (and timed) from a plain python interpreter too.
+'''
+
+import time
+
+import numpy as np
+
+CHANCE_TO_START_ALIVE = 0.40
+DEATH_LIMIT = 3
+BIRTH_LIMIT = 4
+NUMBER_OF_ITERATIONS = 6
+WIDTH = 2048
+HEIGHT = WIDTH
+DENSE_STEP_FRACTION = 0.02  # incremental stepping falls back to a full pass when more of the map than this is dirty
+
+
+# returns a HEIGHT x WIDTH boolean array where roughly chance_to_start_alive of the cells are alive
+def initialize_map(width, height, chance_to_start_alive=CHANCE_TO_START_ALIVE, seed=None):
+    # RandomState rather than default_rng, the NumPy that ships with the older 2.8x releases does not have the latter
+    rng = np.random.RandomState(seed)
+    return rng.random_sample((height, width)) < chance_to_start_alive
+
+
+# converts the list of lists level_map used by the scripts into a boolean array and back
+def to_array(level_map):
+    return np.array(level_map, dtype=bool)
+
+
+def to_list(cell_array):
+    return cell_array.tolist()
+
+
+# Returns an array holding the number of live cells in the ring around every cell.
+# The map is padded with a ring of live cells so that out of bounds neighbors count as alive.
+def count_alive_neighbors(live_map):
+    padded = np.pad(live_map, 1, mode='constant', constant_values=True)
+    return count_padded_neighbors(padded)
+
+
+# same as count_alive_neighbors, for a window that already carries a one cell border around the cells to count
+def count_padded_neighbors(padded):
+    rows = padded.shape[0] - 2
+    cols = padded.shape[1] - 2
+    padded = padded.view(np.uint8)
+    count = np.zeros((rows, cols), dtype=np.uint8)
+    for i in range(3):
+        for j in range(3):
+            if i == 1 and j == 1:
+                continue  # we don't want to add ourselves in!
+            count += padded[i:i + rows, j:j + cols]
+    return count
+
+
+def perform_game_of_life_iteration(old_map, death_limit=DEATH_LIMIT, birth_limit=BIRTH_LIMIT):
+    return apply_rules(old_map, count_alive_neighbors(old_map), death_limit, birth_limit)
+
+
+def apply_rules(old_map, live_neighbor_count, death_limit=DEATH_LIMIT, birth_limit=BIRTH_LIMIT):
+    # live cells stay walls unless they are starved, empty cells become walls when crowded
+    survives = old_map & (live_neighbor_count >= death_limit)
+    born = ~old_map & (live_neighbor_count > birth_limit)
+    return survives | born
+
+
+def generate_map(width, height, number_of_iterations=NUMBER_OF_ITERATIONS, chance_to_start_alive=CHANCE_TO_START_ALIVE,
+                 death_limit=DEATH_LIMIT, birth_limit=BIRTH_LIMIT, seed=None, initial_map=None):
+    # an initial_map (list of lists or array) can be passed in to reproduce a run of the pure python scripts
+    if initial_map is None:
+        cellmap = initialize_map(width, height, chance_to_start_alive, seed)
+    else:
+        cellmap = to_array(initial_map)
+    for i in range(number_of_iterations):
+        cellmap = perform_game_of_life_iteration(cellmap, death_limit, birth_limit)
+    return cellmap
+
+
+# Runs the simulation like generate_map, but only re-evaluates the cells that neighbor a cell that changed
+# during the last iteration, and stops as soon as the map settles into a fixed point or flips between two states.
+# The map is returned exactly as if all number_of_iterations had been run, together with the number of iterations
+# that actually had to be computed.
+def generate_map_incremental(width, height, number_of_iterations=NUMBER_OF_ITERATIONS,
+                             chance_to_start_alive=CHANCE_TO_START_ALIVE, death_limit=DEATH_LIMIT,
+                             birth_limit=BIRTH_LIMIT, seed=None, initial_map=None):
+    if initial_map is None:
+        cellmap = initialize_map(width, height, chance_to_start_alive, seed)
+    else:
+        cellmap = to_array(initial_map)
+    height, width = cellmap.shape
+    # Two padded buffers are swapped back and forth, the border ring stays alive for the edge rule.
+    # Before an iteration is written, the spare buffer still holds the map from two iterations ago,
+    # which already is correct for every cell that did not change during the last iteration.
+    current = np.pad(cellmap, 1, mode='constant', constant_values=True)
+    following = current.copy()
+    stride = width + 2
+    ring_offsets = np.array([i * stride + j for i in (-1, 0, 1) for j in (-1, 0, 1) if i != 0 or j != 0])
+    interior = np.zeros(current.shape, dtype=bool)
+    interior[1:-1, 1:-1] = True
+    interior = interior.ravel()
+    dirty = None  # the first iteration has to look at every cell
+
+    for iteration in range(1, number_of_iterations + 1):
+        if dirty is None:
+            new_map = perform_game_of_life_iteration(current[1:-1, 1:-1], death_limit, birth_limit)
+            repeats_previous = iteration > 1 and np.array_equal(new_map, following[1:-1, 1:-1])
+            following[1:-1, 1:-1] = new_map
+            changed = np.flatnonzero(following != current)
+        else:
+            current_flat = current.ravel()
+            following_flat = following.ravel()
+            count = np.zeros(len(dirty), dtype=np.uint8)
+            for offset in ring_offsets:
+                count += current_flat[dirty + offset]
+            old_cells = current_flat[dirty]
+            new_cells = apply_rules(old_cells, count, death_limit, birth_limit)
+            changed = dirty[new_cells != old_cells]
+            repeats_previous = np.array_equal(new_cells, following_flat[dirty])
+            following_flat[dirty] = new_cells
+        current, following = following, current
+
+        if len(changed) == 0:
+            return current[1:-1, 1:-1], iteration  # fixed point, nothing will change any more
+        if repeats_previous:
+            # the map flips between two states, pick the one the last iteration would have landed on
+            if (number_of_iterations - iteration) % 2:
+                return following[1:-1, 1:-1], iteration
+            return current[1:-1, 1:-1], iteration
+        # the changed cells and their ring of neighbors are the only ones that can change next time around
+        if len(changed) * 9 > DENSE_STEP_FRACTION * width * height:
+            dirty = None  # too much is still moving, a full pass is cheaper than tracking the cells
+        else:
+            dirty = np.unique((changed[:, None] + np.append(ring_offsets, 0)).ravel())
+            dirty = dirty[interior[dirty]]
+    return current[1:-1, 1:-1], number_of_iterations
+
+
+if __name__ == '__main__':
+    start = time.perf_counter()
+    cave = generate_map(WIDTH, HEIGHT, seed=0)
+    print(f'{WIDTH}x{HEIGHT} cave, {NUMBER_OF_ITERATIONS} iterations: {time.perf_counter() - start:.3f}s')
+    start = time.perf_counter()
+    incremental_cave, iterations_run = generate_map_incremental(WIDTH, HEIGHT, number_of_iterations=50, seed=0)
+    print(f'{WIDTH}x{HEIGHT} cave, incremental stepping stopped after {iterations_run} of 50 iterations: '
+          f'{time.perf_counter() - start:.3f}s')
@@ -0,0 +1,103 @@
+'''
+Author: Aaron J. Olson
+https://aaronjolson.io
+
+Process pool driver for the cellular automata / game of life cave generator.
+The map is split into square tiles, and every tile is simulated in its own worker process together with a halo of
+NUMBER_OF_ITERATIONS cells of its neighbors. The halo shrinks by one cell per iteration (the cells on its outer ring
+are missing neighbors), so after the last iteration exactly the tile is left and it is bit identical to the single
+process run from cellular_automata_engine.generate_map. Map sides keep the "out of bounds counts as alive" rule.
+
+The map and the result live in shared memory blocks, workers only receive the block names and their tile bounds
+instead of pickled lists.
+
+Run this from a regular python interpreter (or call generate_map_parallel from a script guarded by
+if __name__ == '__main__'), worker processes are started with the spawn method on Windows and macOS.
+'''
+
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+
+import cellular_automata_engine
+from cellular_automata_engine import apply_rules, count_padded_neighbors
+
+DEATH_LIMIT = 3
+BIRTH_LIMIT = 4
+NUMBER_OF_ITERATIONS = 6
+TILE_SIZE = 1024  # width and height of the block of cells handed to one worker
+WIDTH = 8192
+HEIGHT = WIDTH
+
+
+# runs inside of a worker, simulates one tile and writes it into the shared result
+def step_tile(map_name, result_name, shape, y0, y1, x0, x1, number_of_iterations, death_limit, birth_limit):
+    source = shared_memory.SharedMemory(name=map_name)
+    result = shared_memory.SharedMemory(name=result_name)
+    try:
+        height, width = shape
+        cellmap = np.ndarray(shape, dtype=bool, buffer=source.buf)
+        halo = number_of_iterations
+        top = max(y0 - halo, 0)
+        bottom = min(y1 + halo, height)
+        left = max(x0 - halo, 0)
+        right = min(x1 + halo, width)
+        window = cellmap[top:bottom, left:right].copy()
+
+        # sides that touch the edge of the map get a ring of live cells every iteration and keep their size,
+        # the other sides lose their outermost ring since it does not know all of its neighbors
+        edge_padding = ((1 if top == 0 else 0, 1 if bottom == height else 0),
+                        (1 if left == 0 else 0, 1 if right == width else 0))
+        for i in range(number_of_iterations):
+            padded = np.pad(window, edge_padding, mode='constant', constant_values=True)
+            window = apply_rules(padded[1:-1, 1:-1], count_padded_neighbors(padded), death_limit, birth_limit)
+
+        # the halo is used up on every side that did not touch the map edge
+        if not edge_padding[0][0]:
+            top += number_of_iterations
+        if not edge_padding[1][0]:
+            left += number_of_iterations
+        tile = window[y0 - top:y1 - top, x0 - left:x1 - left]
+        np.ndarray(shape, dtype=bool, buffer=result.buf)[y0:y1, x0:x1] = tile
+    finally:
+        source.close()
+        result.close()
+
+
+def generate_map_parallel(cellmap, number_of_iterations=NUMBER_OF_ITERATIONS, death_limit=DEATH_LIMIT,
+                          birth_limit=BIRTH_LIMIT, tile_size=TILE_SIZE, max_workers=None):
+    cellmap = np.asarray(cellmap, dtype=bool)
+    height, width = cellmap.shape
+    source = shared_memory.SharedMemory(create=True, size=max(cellmap.nbytes, 1))
+    result = shared_memory.SharedMemory(create=True, size=max(cellmap.nbytes, 1))
+    try:
+        np.ndarray(cellmap.shape, dtype=bool, buffer=source.buf)[:] = cellmap
+        with ProcessPoolExecutor(max_workers=max_workers or os.cpu_count()) as executor:
+            futures = []
+            for y0 in range(0, height, tile_size):
+                for x0 in range(0, width, tile_size):
+                    futures.append(executor.submit(step_tile, source.name, result.name, cellmap.shape,
+                                                   y0, min(y0 + tile_size, height), x0, min(x0 + tile_size, width),
+                                                   number_of_iterations, death_limit, birth_limit))
+            for future in futures:
+                future.result()  # surfaces any exception raised inside of a worker
+        return np.ndarray(cellmap.shape, dtype=bool, buffer=result.buf).copy()
+    finally:
+        source.close()
+        source.unlink()
+        result.close()
+        result.unlink()
+
+
+if __name__ == '__main__':
+    initial_map = cellular_automata_engine.initialize_map(WIDTH, HEIGHT, seed=0)
+    start = time.perf_counter()
+    single = cellular_automata_engine.generate_map(WIDTH, HEIGHT, initial_map=initial_map)
+    print(f'{WIDTH}x{HEIGHT} single process: {time.perf_counter() - start:.3f}s')
+    start = time.perf_counter()
+    parallel = generate_map_parallel(initial_map)
+    print(f'{WIDTH}x{HEIGHT} {os.cpu_count()} processes: {time.perf_counter() - start:.3f}s')
+    print(f'bit identical: {np.array_equal(single, parallel)}')
@@ -0,0 +1,79 @@
+'''
+Author: Aaron J. Olson
+https://aaronjolson.io
+
+Breadth first search distance fields over a walkable tile grid (a boolean grid indexed [y, x]).
+The search runs one frontier at a time: the whole frontier is stepped to its four neighbors with array operations,
+so the Python loop only runs once per distance instead of once per cell.
+The distance field is kept around for anything that wants to know how far a cell is from the start
+(spawners, difficulty scaling, ...).
+'''
+
+import time
+
+import numpy as np
+
+UNREACHABLE = -1
+BLOCKED = -2  # only used while searching
+BENCHMARK_SIZE = 4000
+
+
+# Returns the number of steps from start (x, y) to every cell of the walkable grid, walking up, down, left and right.
+# Cells that can not be reached (or are not walkable) get UNREACHABLE.
+def distance_field(walkable, start):
+    rows, cols = walkable.shape
+    # a border of blocked cells keeps the flat index steps from wrapping around the rows
+    padded = np.pad(walkable, 1, mode='constant', constant_values=False).ravel()
+    stride = cols + 2
+    steps = np.array([1, -1, stride, -stride], dtype=np.int64)
+    # blocked cells are marked right in the distance field, so one lookup tells if a neighbor still needs a visit
+    distances = np.full(padded.shape, BLOCKED, dtype=np.int32)
+    distances[padded] = UNREACHABLE
+    claimed_by = np.zeros(padded.shape, dtype=np.int32)  # scratch space for dropping repeated cells from a frontier
+
+    frontier = np.array([(start[1] + 1) * stride + start[0] + 1], dtype=np.int64)
+    if not padded[frontier[0]]:
+        raise ValueError(f'start {start} is not walkable')
+    distances[frontier] = 0
+    distance = 0
+    while len(frontier):
+        distance += 1
+        neighbors = (frontier[:, None] + steps).ravel()
+        neighbors = neighbors[distances[neighbors] == UNREACHABLE]
+        # a cell reached from several frontier cells shows up several times, keep the copy that wrote last
+        order = np.arange(len(neighbors), dtype=np.int32)
+        claimed_by[neighbors] = order
+        frontier = neighbors[claimed_by[neighbors] == order]
+        distances[frontier] = distance
+    distances[distances == BLOCKED] = UNREACHABLE
+    return distances.reshape(rows + 2, cols + 2)[1:-1, 1:-1]
+
+
+# the (x, y) cell with the largest distance in the field
+def farthest_cell(distances):
+    y, x = np.unravel_index(int(np.argmax(distances)), distances.shape)
+    return int(x), int(y)
+
+
+# Double sweep: search from any walkable cell (start or the first walkable one), the farthest cell from there
+# is one end of a longest shortest path, searching again from that end gives the other one.
+# Returns the two (x, y) ends and the distance field measured from the first end.
+def double_sweep(walkable, start=None):
+    if start is None:
+        y, x = np.unravel_index(int(np.argmax(walkable)), walkable.shape)
+        start = (int(x), int(y))
+    first = farthest_cell(distance_field(walkable, start))
+    distances = distance_field(walkable, first)
+    return first, farthest_cell(distances), distances
+
+
+if __name__ == '__main__':
+    # 12x12 rooms every 20 cells joined by one cell wide corridors, roughly what the castle generators lay out
+    offsets = np.arange(BENCHMARK_SIZE) % 20
+    in_room = (offsets >= 4) & (offsets < 16)
+    on_corridor = offsets == 10
+    benchmark_grid = (in_room[:, None] & in_room[None, :]) | on_corridor[:, None] | on_corridor[None, :]
+    start_time = time.perf_counter()
+    first_end, last_end, benchmark_distances = double_sweep(benchmark_grid)
+    print(f'double sweep over {BENCHMARK_SIZE}x{BENCHMARK_SIZE}: {first_end} -> {last_end}, '
+          f'{benchmark_distances[last_end[1], last_end[0]]} steps, {time.perf_counter() - start_time:.3f}s')
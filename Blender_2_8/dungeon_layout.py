@@ -0,0 +1,292 @@
+'''
+Author: Aaron J. Olson
+https://aaronjolson.io
+
+Shared layout helpers for the castle dungeon generators.
+
+The dungeon map is a compact typed grid: a uint8 tile type per cell (indexed [y, x]), plus a uint8 layer of bit flags
+for the generators that need them, instead of a dict per cell. That is at most two bytes a cell, so even 4000x4000
+maps only take a few dozen MB.
+'''
+
+import math
+import time
+from collections import defaultdict
+
+import numpy as np
+
+# tile types
+EMPTY = 0
+FLOOR = 1
+WALL = 2
+STAIRS_UP = 3
+STAIRS_DOWN = 4
+# the open with start and end variant marks its end and start with the stairs tiles
+END = STAIRS_UP
+START = STAIRS_DOWN
+
+# bit flags stored per cell next to the tile types
+RENDER = 1  # geometry gets placed for the cell
+
+MAX_PLACEMENT_ATTEMPTS = 200  # rejected rooms in a row before the placement fallback kicks in
+CANDIDATE_NEIGHBORS = 8  # how many of its nearest rooms each room considers for the corridors and the loops
+DISTANCE_BLOCK = 256  # rooms per block when measuring the distance from a piece of the layout to the rest of it
+BENCHMARK_ROOMS = 10000
+
+
+# the tile grid of an empty y_size x x_size map
+def new_tile_grid(x_size, y_size):
+    return np.full((y_size, x_size), EMPTY, dtype=np.uint8)
+
+
+# the bit flag layer that goes with it, every cell starting out with RENDER set or not
+def new_flag_grid(x_size, y_size, render=True):
+    return np.full((y_size, x_size), RENDER if render else 0, dtype=np.uint8)
+
+
+# Carves the L shaped corridor that walks from (from_x, from_y) to (to_x, to_y), first along x then along y, as two
+# slice assignments. Like the cell by cell walk it replaces, every cell stepped onto is carved but the first one is not.
+def carve_corridor(tiles, from_x, from_y, to_x, to_y, tile=FLOOR):
+    if from_x < to_x:
+        tiles[from_y, from_x + 1:to_x + 1] = tile
+    elif from_x > to_x:
+        tiles[from_y, to_x:from_x] = tile
+    if from_y < to_y:
+        tiles[from_y + 1:to_y + 1, to_x] = tile
+    elif from_y > to_y:
+        tiles[to_y:from_y, to_x] = tile
+
+
+# sets every cell of the (shrunk) room to tile
+def fill_room(tiles, room, tile=FLOOR):
+    tiles[room['y']:room['y'] + room['h'], room['x']:room['x'] + room['w']] = tile
+
+
+# Turns the empty cells diagonally next to a floor cell into walls, as a single dilation of the floor mask.
+# Only the diagonal neighbors count, like in the nested yy / xx loops (stepping by 2) this replaces.
+def build_wall_ring(tiles):
+    floor = np.pad(tiles == FLOOR, 1, mode='constant', constant_values=False)
+    rows, cols = tiles.shape
+    ring = floor[:rows, :cols] | floor[:rows, 2:] | floor[2:, :cols] | floor[2:, 2:]
+    tiles[ring & (tiles == EMPTY)] = WALL
+
+
+# Uniform grid spatial hash over the placed rooms, a room is filed under every bucket its cells fall into.
+# Collision checks only look at the rooms in the buckets the new room covers instead of every placed room.
+class RoomSpatialHash:
+    def __init__(self, bucket_size):
+        self.bucket_size = max(int(bucket_size), 1)
+        self.buckets = defaultdict(list)
+
+    def buckets_for(self, room):
+        size = self.bucket_size
+        for bucket_y in range(room['y'] // size, (room['y'] + max(room['h'], 1) - 1) // size + 1):
+            for bucket_x in range(room['x'] // size, (room['x'] + max(room['w'], 1) - 1) // size + 1):
+                yield bucket_x, bucket_y
+
+    def add(self, room):
+        for bucket in self.buckets_for(room):
+            self.buckets[bucket].append(room)
+
+    # same overlap test as Dungeon.does_collide
+    def collides(self, room):
+        for bucket in self.buckets_for(room):
+            for comparison_room in self.buckets.get(bucket, ()):
+                if room['x'] < comparison_room['x'] + comparison_room['w'] \
+                        and room['x'] + room['w'] > comparison_room['x'] \
+                        and room['y'] < comparison_room['y'] + comparison_room['h'] \
+                        and room['y'] + room['h'] > comparison_room['y']:
+                    return True
+        return False
+
+
+# Places up to num_rooms rooms drawn by new_room(max_size), rejecting the ones that collide with a placed room.
+# Placed rooms lose one cell of width and height, which leaves a gap between neighbors (like Dungeon.generate did).
+# After max_attempts rejections in a row the fallback decides what happens:
+#   'shrink' - draw smaller rooms from then on, until min_size is reached, then stop
+#   'stop'   - stop placing rooms
+# Returns the placed rooms, which can be fewer than num_rooms on a crowded map.
+def place_rooms(num_rooms, new_room, min_size, max_size, max_attempts=MAX_PLACEMENT_ATTEMPTS, fallback='shrink'):
+    spatial_hash = RoomSpatialHash(max_size)
+    rooms = []
+    size = max_size
+    rejected = 0
+    while len(rooms) < num_rooms:
+        room = new_room(size)
+        if spatial_hash.collides(room):
+            rejected += 1
+            if rejected < max_attempts:
+                continue
+            rejected = 0
+            # rooms are drawn with sizes from min_size up to (but not including) size
+            if fallback == 'shrink' and size > min_size + 1:
+                size -= 1
+                continue
+            break
+        rejected = 0
+        room['w'] -= 1
+        room['h'] -= 1
+        spatial_hash.add(room)
+        rooms.append(room)
+    return rooms
+
+
+# (n, 2) array of the room centers
+def room_centers(rooms):
+    return np.array([(room['x'] + room['w'] / 2, room['y'] + room['h'] / 2) for room in rooms], dtype=np.float64)
+
+
+# Candidate corridors between rooms that are close to each other. The centers are dropped into a uniform grid of
+# buckets (like RoomSpatialHash), sized to hold about `neighbors` rooms each, and every room is paired with the
+# `neighbors` nearest rooms among its own bucket and the 8 around it.
+# Returns the (m, 2) array of (i, j), i < j, edges without repeats, sorted shortest first.
+def candidate_edges(centers, neighbors=CANDIDATE_NEIGHBORS):
+    count = len(centers)
+    if count < 2:
+        return np.zeros((0, 2), dtype=np.int64)
+    corner = centers.min(axis=0)
+    span = np.maximum(centers.max(axis=0) - corner, 1.0)
+    bucket_size = max(math.sqrt(span[0] * span[1] * neighbors / count), 1.0)
+    bucket_x, bucket_y = (np.floor((centers - corner) / bucket_size).astype(np.int64)).T
+    # rooms sorted by bucket, so every bucket is one slice of the order
+    order = np.lexsort((bucket_y, bucket_x))
+    keys, starts, sizes = np.unique(np.column_stack((bucket_x, bucket_y))[order], axis=0, return_index=True,
+                                    return_counts=True)
+    buckets = {(int(x), int(y)): order[start:start + size] for (x, y), start, size in zip(keys, starts, sizes)}
+
+    pairs = []
+    for (x, y), members in buckets.items():
+        nearby = np.concatenate([buckets[(x + dx, y + dy)] for dx in (-1, 0, 1) for dy in (-1, 0, 1)
+                                 if (x + dx, y + dy) in buckets])
+        k = min(neighbors, len(nearby) - 1)
+        if k < 1:
+            continue
+        distance = np.abs(centers[members, None, 0] - centers[None, nearby, 0]) \
+            + np.abs(centers[members, None, 1] - centers[None, nearby, 1])
+        distance[members[:, None] == nearby[None, :]] = np.inf
+        nearest = nearby[np.argpartition(distance, k - 1, axis=1)[:, :k]]
+        pairs.append(np.column_stack((np.repeat(members, k), nearest.ravel())))
+    if not pairs:
+        return np.zeros((0, 2), dtype=np.int64)
+    pairs = np.sort(np.concatenate(pairs), axis=1)
+    edges = np.unique(pairs, axis=0)
+    lengths = np.abs(centers[edges[:, 0]] - centers[edges[:, 1]]).sum(axis=1)
+    return edges[np.argsort(lengths, kind='stable')]
+
+
+# Minimum spanning tree over the candidate edges (Kruskal's algorithm with union-find, the edges come shortest first).
+# When the candidates leave the rooms in more than one piece, the pieces get joined through their nearest pair of
+# rooms, so the tree always reaches every room. Returns count - 1 (i, j) edges.
+def spanning_tree_edges(centers, edges):
+    count = len(centers)
+    parent = list(range(count))
+
+    def find(room):
+        while parent[room] != room:
+            parent[room] = parent[parent[room]]
+            room = parent[room]
+        return room
+
+    tree = []
+    for i, j in edges.tolist():
+        root_i, root_j = find(i), find(j)
+        if root_i != root_j:
+            parent[root_i] = root_j
+            tree.append((i, j))
+            if len(tree) == count - 1:
+                return tree
+    if count > 1:
+        tree.extend(join_pieces(centers, np.array([find(room) for room in range(count)])))
+    return tree
+
+
+# Edges that join the pieces of a split room graph (labels holds the piece of every room), each time from the smallest
+# piece to its nearest room in any other piece, measured DISTANCE_BLOCK rooms at a time.
+def join_pieces(centers, labels):
+    edges = []
+    while True:
+        pieces, sizes = np.unique(labels, return_counts=True)
+        if len(pieces) < 2:
+            return edges
+        piece = pieces[np.argmin(sizes)]
+        members = np.flatnonzero(labels == piece)
+        others = np.flatnonzero(labels != piece)
+        best = (np.inf, 0, 0)
+        for start in range(0, len(members), DISTANCE_BLOCK):
+            block = members[start:start + DISTANCE_BLOCK]
+            distance = np.abs(centers[block, None, 0] - centers[None, others, 0]) \
+                + np.abs(centers[block, None, 1] - centers[None, others, 1])
+            row, column = np.unravel_index(int(np.argmin(distance)), distance.shape)
+            if distance[row, column] < best[0]:
+                best = (distance[row, column], int(block[row]), int(others[column]))
+        _, i, j = best
+        edges.append((min(i, j), max(i, j)))
+        labels[labels == piece] = labels[j]
+
+
+# Up to count extra candidate edges that are not part of the tree, shortest first, to put loops in the layout.
+def loop_edges(edges, tree_edges, count):
+    if count <= 0:
+        return []
+    tree = {(min(i, j), max(i, j)) for i, j in tree_edges}
+    loops = []
+    for i, j in edges.tolist():
+        if (i, j) not in tree:
+            loops.append((i, j))
+            if len(loops) == count:
+                break
+    return loops
+
+
+# Returns the (room_index, room_index) pairs that need a corridor so every room is reachable from every other room:
+# the minimum spanning tree over the nearby room pairs followed by up to extra_connections loop edges from the same
+# pairs. Grid buckets keep this close to linear in the number of rooms.
+def connection_edges(rooms, extra_connections=0):
+    centers = room_centers(rooms)
+    edges = candidate_edges(centers)
+    tree_edges = spanning_tree_edges(centers, edges)
+    return tree_edges + loop_edges(edges, tree_edges, extra_connections)
+
+
+# Indices (i, j), i < j, of the two centers that are the farthest apart in manhattan distance, found in linear time.
+# |ax - bx| + |ay - by| is the larger of |(ax + ay) - (bx + by)| and |(ax - ay) - (bx - by)|, so the farthest pair
+# is the one with the biggest spread along either x + y or x - y.
+def farthest_pair(centers):
+    spreads = []
+    for projection in (centers[:, 0] + centers[:, 1], centers[:, 0] - centers[:, 1]):
+        low, high = int(np.argmin(projection)), int(np.argmax(projection))
+        spreads.append((projection[high] - projection[low], min(low, high), max(low, high)))
+    spread, i, j = max(spreads, key=lambda candidate: candidate[0])
+    return i, j
+
+
+# the pairwise search farthest_pair replaced, kept for the benchmark below
+def farthest_pair_pairwise(centers):
+    centers = centers.tolist()
+    farthest = -1
+    pair = (0, 0)
+    for i, (ax, ay) in enumerate(centers):
+        for j in range(i + 1, len(centers)):
+            bx, by = centers[j]
+            distance = abs(bx - ax) + abs(by - ay)
+            if distance > farthest:
+                farthest = distance
+                pair = (i, j)
+    return pair
+
+
+if __name__ == '__main__':
+    benchmark_centers = np.random.RandomState(0).uniform(0, 4000, (BENCHMARK_ROOMS, 2))
+    start_time = time.perf_counter()
+    linear_pair = farthest_pair(benchmark_centers)
+    linear_time = time.perf_counter() - start_time
+    start_time = time.perf_counter()
+    pairwise_pair = farthest_pair_pairwise(benchmark_centers)
+    pairwise_time = time.perf_counter() - start_time
+    print(f'farthest pair of {BENCHMARK_ROOMS} rooms: linear {linear_time:.4f}s {linear_pair}, '
+          f'pairwise {pairwise_time:.2f}s {pairwise_pair}')
+    start_time = time.perf_counter()
+    benchmark_edges = candidate_edges(benchmark_centers)
+    benchmark_tree = spanning_tree_edges(benchmark_centers, benchmark_edges)
+    print(f'spanning tree of {BENCHMARK_ROOMS} rooms: {time.perf_counter() - start_time:.2f}s '
+          f'over {len(benchmark_edges)} candidate edges')
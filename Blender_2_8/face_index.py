@@ -0,0 +1,77 @@
+'''
+Author: Aaron J. Olson
+https://aaronjolson.io
+
+Spatial index for the faces of the extrusion based generators (random_walk_via_extrusion.py and
+recursive_backtracking_maze.py). Faces are keyed by their rounded center and their axis aligned normal,
+so finding the face to extrude from is a dictionary lookup instead of a scan over every face of the mesh.
+The extrusion itself goes through bmesh.ops, which hands back the faces it created so the index
+can be kept up to date without rescanning anything.
+'''
+
+import bmesh
+
+# names for the axis aligned normals, faces pointing any other way are not indexed
+AXES = {(1, 0, 0): '+x', (-1, 0, 0): '-x', (0, 1, 0): '+y', (0, -1, 0): '-y', (0, 0, 1): '+z', (0, 0, -1): '-z'}
+
+
+class FaceIndex:
+    def __init__(self, bm):
+        self.bm = bm
+        self.faces = {}
+        for face in bm.faces:
+            self.add(face)
+
+    @staticmethod
+    def face_key(face):
+        normal = tuple(round(n) for n in face.normal)
+        axis = AXES.get(normal)
+        if axis is None or abs(face.normal.dot(normal) - 1.0) > 1e-4:
+            return None
+        center = face.calc_center_median()
+        return round(center[0]), round(center[1]), axis
+
+    def add(self, face):
+        key = self.face_key(face)
+        if key is not None:
+            self.faces[key] = face
+
+    def remove(self, face):
+        key = self.face_key(face)
+        if key is not None and self.faces.get(key) is face:
+            del self.faces[key]
+
+    # returns the face whose rounded center is (x, y) and whose normal points along axis ('+x', '-y', ...)
+    def get(self, x, y, axis):
+        face = self.faces.get((round(x), round(y), axis))
+        if face is not None and face.is_valid:
+            return face
+        return None
+
+    # Extrudes face by offset like extrude_region_move + translate does and returns the face at the end of the
+    # extrusion. The original face ends up inside of the new geometry and is deleted, the new faces are indexed.
+    def extrude(self, face, offset):
+        self.remove(face)
+        extruded = bmesh.ops.extrude_face_region(self.bm, geom=[face])
+        new_verts = [g for g in extruded['geom'] if isinstance(g, bmesh.types.BMVert)]
+        new_faces = [g for g in extruded['geom'] if isinstance(g, bmesh.types.BMFace)]
+        bmesh.ops.translate(self.bm, vec=offset, verts=new_verts)
+        if face.is_valid:
+            bmesh.ops.delete(self.bm, geom=[face], context='FACES_ONLY')
+
+        end_face = None
+        for new_face in new_faces:
+            new_face.normal_update()
+            self.add(new_face)
+        # the side walls of the new segment share edges with the faces they were extruded from
+        for new_face in new_faces:
+            for edge in new_face.edges:
+                for linked_face in edge.link_faces:
+                    if linked_face not in new_faces:
+                        linked_face.normal_update()
+                        self.add(linked_face)
+        # the cap at the end of the extrusion is the face that points the same way the original one did
+        for new_face in new_faces:
+            if new_face.normal.dot(offset) > 0 and all(v in new_verts for v in new_face.verts):
+                end_face = new_face
+        return end_face
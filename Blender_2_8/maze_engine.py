@@ -0,0 +1,131 @@
+'''
+Author: Aaron J. Olson
+https://aaronjolson.io
+
+Array backed recursive backtracking (depth first search) maze engine.
+Cells are addressed by their flat index x + y * cols, the open walls and the directions that still lead to an unvisited
+neighbor are kept as bits in flat byte arrays, the depth first search runs on an explicit stack, and a visited counter
+tells when the maze is finished, so no cell objects are created and nothing is rescanned while carving.
+
+The result is a compact wall bitmask grid, one byte per cell, the bits being UP, RIGHT, DOWN and LEFT
+('up' is y - 1, like the directions recursive_backtracking_maze.py has always used).
+'''
+
+import random
+import time
+from array import array
+
+import numpy as np
+
+UP = 1
+RIGHT = 2
+DOWN = 4
+LEFT = 8
+ALL_WALLS = UP | RIGHT | DOWN | LEFT
+DIRECTION_NAMES = {UP: 'up', RIGHT: 'right', DOWN: 'down', LEFT: 'left'}
+OPPOSITE = {UP: DOWN, RIGHT: LEFT, DOWN: UP, LEFT: RIGHT}
+
+COLS = 4096
+ROWS = 4096
+
+
+# Carves a cols x rows maze, starting from the cell at index start.
+# Returns the wall bitmask grid (rows x cols uint8 array) and, when record_moves is set,
+# the list of (cell index, direction) carving moves in the order the search made them.
+def carve_maze(cols, rows, seed=None, start=0, record_moves=False):
+    rng = random.random if seed is None else random.Random(seed).random
+    total = cols * rows
+    # The cells sit in rows of cols + 1 with an extra row above and below, the extra cells are a border that is never
+    # visited (the extra column at the end of a row is also the border left of the next row), so no bounds checks.
+    stride = cols + 1
+    # every cell keeps the bits of the directions that still lead to an unvisited cell, and the bits of its open walls
+    unvisited = bytearray(unvisited_neighbors(cols, rows).tobytes())
+    open_walls = bytearray(len(unvisited))
+    # (direction, step, direction back) for each direction that is still open, for every unvisited neighbor mask
+    steps = {UP: -stride, RIGHT: 1, DOWN: stride, LEFT: -1}
+    options_for = [tuple((direction, steps[direction], OPPOSITE[direction])
+                         for direction in (UP, RIGHT, DOWN, LEFT) if mask & direction) for mask in range(16)]
+    moves = [] if record_moves else None
+
+    current = (start // cols + 1) * stride + start % cols
+    visit(unvisited, current, stride)
+    visited_count = 1
+    stack = array('q', [current])
+    push = stack.append
+    pop = stack.pop
+    while visited_count < total:
+        options = options_for[unvisited[current]]
+        if not options:  # dead end, back up to the last cell that still has an unvisited neighbor
+            pop()
+            current = stack[-1]
+            while not unvisited[current]:
+                pop()
+                current = stack[-1]
+            continue
+
+        direction, step, back = options[int(rng() * len(options))] if len(options) > 1 else options[0]
+        next_cell = current + step
+        # knock down the wall between the two cells, on both sides
+        open_walls[current] |= direction
+        open_walls[next_cell] = back
+        # the neighbors of the new cell can no longer step into it (written out, this runs once per cell)
+        unvisited[next_cell - stride] &= ALL_WALLS ^ DOWN
+        unvisited[next_cell + stride] &= ALL_WALLS ^ UP
+        unvisited[next_cell - 1] &= ALL_WALLS ^ RIGHT
+        unvisited[next_cell + 1] &= ALL_WALLS ^ LEFT
+        visited_count += 1
+        push(next_cell)
+        if moves is not None:
+            # back to the index without the border
+            moves.append((current - stride - current // stride + 1, direction))
+        current = next_cell
+    return wall_bitmask(open_walls, cols, rows), moves
+
+
+# the unvisited neighbor bits of every cell of an untouched maze, laid out with the border carve_maze uses
+def unvisited_neighbors(cols, rows):
+    padded = np.zeros((rows + 2, cols + 1), dtype=np.uint8)
+    cells = padded[1:-1, :cols]
+    cells[...] = ALL_WALLS
+    cells[0, :] &= ~np.uint8(UP)
+    cells[-1, :] &= ~np.uint8(DOWN)
+    cells[:, 0] &= ~np.uint8(LEFT)
+    cells[:, -1] &= ~np.uint8(RIGHT)
+    return padded
+
+
+# takes the cell at (border) index cell out of the unvisited neighbor bits of the cells around it
+def visit(unvisited, cell, stride):
+    unvisited[cell - stride] &= ALL_WALLS ^ DOWN
+    unvisited[cell + stride] &= ALL_WALLS ^ UP
+    unvisited[cell - 1] &= ALL_WALLS ^ RIGHT
+    unvisited[cell + 1] &= ALL_WALLS ^ LEFT
+
+
+# turns the open wall bits (laid out with the border) into a rows x cols grid of the walls each cell still has
+def wall_bitmask(open_walls, cols, rows):
+    open_walls = np.frombuffer(open_walls, dtype=np.uint8).reshape(rows + 2, cols + 1)[1:-1, :cols]
+    return (ALL_WALLS ^ open_walls).astype(np.uint8)
+
+
+# Lays the maze out on a grid twice as fine, where every cell and every open passage between two cells is a block.
+# Returns the (x, y) positions of those blocks, cell (x, y) sitting at (2x, 2y).
+def corridor_cells(walls):
+    rows, cols = walls.shape
+    cells = [(2 * x, 2 * y) for y in range(rows) for x in range(cols)]
+    for y, x in np.argwhere((walls & RIGHT) == 0):
+        cells.append((2 * int(x) + 1, 2 * int(y)))
+    for y, x in np.argwhere((walls & DOWN) == 0):
+        cells.append((2 * int(x), 2 * int(y) + 1))
+    return cells
+
+
+# splits a flat cell index back into its (x, y) grid position
+def cell_position(index, cols):
+    return index % cols, index // cols
+
+
+if __name__ == '__main__':
+    start_time = time.perf_counter()
+    maze_walls, carving_moves = carve_maze(COLS, ROWS, seed=0)
+    print(f'{COLS}x{ROWS} maze: {time.perf_counter() - start_time:.3f}s')
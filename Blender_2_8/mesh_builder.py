@@ -0,0 +1,327 @@
+'''
+Author: Aaron J. Olson
+https://aaronjolson.io
+
+Helpers for building level geometry directly as mesh data in one pass,
+instead of growing it one operator call (extrude, primitive_cube_add, ...) at a time.
+Vertices are welded as they are added, so the finished mesh needs no remove_doubles.
+
+BatchMeshBuilder does the same for whole arrays of cubes and planes at once: the copies are laid out with NumPy
+and handed to the mesh with foreach_set, so a level with hundreds of thousands of cells is one mesh datablock
+instead of one primitive_*_add operator call (object, undo push, depsgraph update) per cell.
+'''
+
+import time
+
+import bpy
+import numpy as np
+
+# outward facing quads of an axis aligned box, as (x, y, z) corner signs in counter clockwise order
+BOX_FACES = {
+    '+x': ((1, -1, -1), (1, 1, -1), (1, 1, 1), (1, -1, 1)),
+    '-x': ((-1, 1, -1), (-1, -1, -1), (-1, -1, 1), (-1, 1, 1)),
+    '+y': ((1, 1, -1), (-1, 1, -1), (-1, 1, 1), (1, 1, 1)),
+    '-y': ((-1, -1, -1), (1, -1, -1), (1, -1, 1), (-1, -1, 1)),
+    '+z': ((-1, -1, 1), (1, -1, 1), (1, 1, 1), (-1, 1, 1)),
+    '-z': ((-1, -1, -1), (-1, 1, -1), (1, 1, -1), (1, -1, -1)),
+}
+# the grid step that leads to the neighboring box behind each of the side faces
+SIDE_NEIGHBORS = {'+x': (1, 0), '-x': (-1, 0), '+y': (0, 1), '-y': (0, -1)}
+
+# the same box as one set of 8 corners shared by its quads, the way primitive_cube_add builds it
+CUBE_CORNERS = np.array([(x, y, z) for x in (-1, 1) for y in (-1, 1) for z in (-1, 1)], dtype=np.float32)
+CUBE_QUADS = np.array([[int(np.flatnonzero((CUBE_CORNERS == corner).all(axis=1))[0]) for corner in BOX_FACES[side]]
+                       for side in BOX_FACES], dtype=np.int32)
+# a flat square facing up, like primitive_plane_add
+PLANE_CORNERS = np.array(BOX_FACES['+z'], dtype=np.float32) * (1, 1, 0)
+PLANE_QUADS = np.array([[0, 1, 2, 3]], dtype=np.int32)
+BATCH_FACES = 60000  # faces a StreamingMeshBuilder collects before committing them as an object
+UV_SIZE = 2.0  # world units per texture repeat, one repeat per face of a default size cube or plane
+
+
+class MeshBuilder:
+    def __init__(self):
+        self.vertices = []
+        self.faces = []
+        self.vertex_lookup = {}  # welds vertices that land on the same position
+
+    def add_vertex(self, co):
+        key = (round(co[0], 4), round(co[1], 4), round(co[2], 4))
+        index = self.vertex_lookup.get(key)
+        if index is None:
+            index = len(self.vertices)
+            self.vertex_lookup[key] = index
+            self.vertices.append(key)
+        return index
+
+    def add_face(self, corners):
+        self.faces.append(tuple(self.add_vertex(co) for co in corners))
+
+    def add_box_faces(self, center, half_size, sides):
+        for side in sides:
+            self.add_face([(center[0] + sx * half_size, center[1] + sy * half_size, center[2] + sz * half_size)
+                           for sx, sy, sz in BOX_FACES[side]])
+
+    # Adds the outer shell of a single layer of boxes sitting on the (x, y) grid positions in cells.
+    # Side faces are only made where there is no box next door, so the result is the hollow mesh
+    # the extrusion and cube + cleanup_mesh approaches end up with.
+    def add_exposed_boxes(self, cells, size=2.0, z=0.0):
+        cells = set(cells)
+        for x, y in cells:
+            sides = [side for side, (dx, dy) in SIDE_NEIGHBORS.items() if (x + dx, y + dy) not in cells]
+            sides += ['+z', '-z']
+            self.add_box_faces((x * size, y * size, z), size / 2, sides)
+
+    # creates the mesh datablock and an object using it, linked into the active collection
+    def to_object(self, name):
+        mesh = bpy.data.meshes.new(name)
+        mesh.from_pydata(self.vertices, [], self.faces)
+        mesh.update()
+        ob = bpy.data.objects.new(name, mesh)
+        bpy.context.collection.objects.link(ob)
+        return ob
+
+
+class BatchMeshBuilder:
+    def __init__(self):
+        self.vertex_blocks = []
+        self.quad_blocks = []
+        self.material_blocks = []
+        self.vertex_count = 0
+        self.unmerged_face_count = 0  # faces there would have been without greedy merging
+
+    # Adds a copy of a shape (corners scaled by half_size, quads indexing into them) at every (x, y, z) location.
+    def add_shapes(self, locations, corners, quads, half_size, material_index=0):
+        locations = np.asarray(locations, dtype=np.float32).reshape(-1, 3)
+        if len(locations) == 0:
+            return
+        vertices = locations[:, None, :] + corners[None, :, :] * half_size
+        first_vertex = self.vertex_count + np.arange(len(locations), dtype=np.int32) * len(corners)
+        self.vertex_blocks.append(vertices.reshape(-1, 3))
+        self.quad_blocks.append((quads[None, :, :] + first_vertex[:, None, None]).reshape(-1, 4))
+        self.material_blocks.append(np.full(len(locations) * len(quads), material_index, dtype=np.int32))
+        self.vertex_count += len(locations) * len(corners)
+        self.unmerged_face_count += len(locations) * len(quads)
+
+    # cubes (like primitive_cube_add) centered on the (x, y) positions, all at height z
+    def add_cubes(self, positions, z=0.0, size=2.0, material_index=0):
+        self.add_shapes(with_height(positions, z), CUBE_CORNERS, CUBE_QUADS, size / 2, material_index)
+
+    # upward facing planes (like primitive_plane_add) centered on the (x, y) positions, all at height z
+    def add_planes(self, positions, z=0.0, size=2.0, material_index=0):
+        self.add_shapes(with_height(positions, z), PLANE_CORNERS, PLANE_QUADS, size / 2, material_index)
+
+    # Adds the hollow shell of the solid cells of a boolean [y, x] grid: top and bottom quads (each optional) for
+    # every solid cell, side quads only where a solid cell borders an empty one. That is what joining one cube per
+    # cell and running remove_doubles + select_interior_faces leaves behind, without building the cubes first.
+    # Corners are welded by their grid index, cell grid[0, 0] is centered on origin * size.
+    # greedy merges neighboring faces that lie in the same plane into larger rectangles.
+    def add_grid_shell(self, solid, origin=(0, 0), size=2.0, z=0.0, floors=True, ceilings=True, greedy=False,
+                       material_index=0):
+        solid = np.asarray(solid, dtype=bool)
+        padded = np.pad(solid, 1, mode='constant', constant_values=False)
+        exposed = {
+            '+x': solid & ~padded[1:-1, 2:],
+            '-x': solid & ~padded[1:-1, :-2],
+            '+y': solid & ~padded[2:, 1:-1],
+            '-y': solid & ~padded[:-2, 1:-1],
+            '+z': solid if ceilings else None,
+            '-z': solid if floors else None,
+        }
+        rectangles = {side: side_rectangles(mask, side, greedy) for side, mask in exposed.items() if mask is not None}
+        self.unmerged_face_count += sum(int(mask.sum()) for mask in exposed.values() if mask is not None)
+        self.add_lattice_quads(rectangles, solid.shape, origin, size, z, material_index)
+
+    # upward facing floor tiles (like primitive_plane_add) on the True cells of a [y, x] grid, all at height z,
+    # merged into larger rectangles with greedy
+    def add_grid_planes(self, mask, origin=(0, 0), size=2.0, z=0.0, greedy=False, material_index=0):
+        mask = np.asarray(mask, dtype=bool)
+        self.unmerged_face_count += int(mask.sum())
+        # the lattice puts '+z' corners half a cell above its center height
+        self.add_lattice_quads({'+z': side_rectangles(mask, '+z', greedy)}, mask.shape, origin, size, z - size / 2,
+                               material_index)
+
+    # Adds a quad for every (x, y, w, h) cell rectangle, facing its side. The corners sit on the grid lattice
+    # (cells (x, y) of a rows x cols grid, one cell high) and are welded by their lattice index.
+    def add_lattice_quads(self, rectangles, shape, origin, size, z, material_index):
+        rows, cols = shape
+        quad_blocks = []
+        for side, (x, y, w, h) in rectangles.items():
+            upper = np.array(BOX_FACES[side]) > 0  # which corners sit on the far end of the rectangle
+            corner_x = x[:, None] + upper[:, 0] * w[:, None]
+            corner_y = y[:, None] + upper[:, 1] * h[:, None]
+            corner_z = np.broadcast_to(upper[:, 2].astype(np.int64), corner_x.shape)
+            quad_blocks.append((corner_z * (rows + 1) + corner_y) * (cols + 1) + corner_x)
+        if not quad_blocks or not sum(len(block) for block in quad_blocks):
+            return
+        lattice_ids, quads = np.unique(np.concatenate(quad_blocks), return_inverse=True)
+        corner_z, rest = np.divmod(lattice_ids, (rows + 1) * (cols + 1))
+        corner_y, corner_x = np.divmod(rest, cols + 1)
+        vertices = np.column_stack(((origin[0] + corner_x - 0.5) * size,
+                                    (origin[1] + corner_y - 0.5) * size,
+                                    z + (corner_z - 0.5) * size)).astype(np.float32)
+        quads = quads.reshape(-1, 4).astype(np.int32) + self.vertex_count
+        self.vertex_blocks.append(vertices)
+        self.quad_blocks.append(quads)
+        self.material_blocks.append(np.full(len(quads), material_index, dtype=np.int32))
+        self.vertex_count += len(vertices)
+
+    @property
+    def face_count(self):
+        return sum(len(quads) for quads in self.quad_blocks)
+
+    # Fills a new mesh datablock straight from the collected arrays. Every face gets UVs projected from the world
+    # axes it lies along, one texture repeat per uv_size units, so textures run on seamlessly across faces no matter
+    # how large they are (merged faces included), like the UV layer primitive_*_add always made.
+    # uv_size=None leaves the mesh without a UV layer.
+    def to_mesh(self, name, uv_size=UV_SIZE):
+        vertices = np.concatenate(self.vertex_blocks) if self.vertex_blocks else np.zeros((0, 3), dtype=np.float32)
+        quads = np.concatenate(self.quad_blocks) if self.quad_blocks else np.zeros((0, 4), dtype=np.int32)
+        materials = np.concatenate(self.material_blocks) if self.material_blocks else np.zeros(0, dtype=np.int32)
+        mesh = bpy.data.meshes.new(name)
+        mesh.vertices.add(len(vertices))
+        mesh.vertices.foreach_set('co', vertices.ravel())
+        mesh.loops.add(quads.size)
+        mesh.loops.foreach_set('vertex_index', quads.ravel())
+        mesh.polygons.add(len(quads))
+        mesh.polygons.foreach_set('loop_start', np.arange(0, quads.size, 4, dtype=np.int32))
+        # newer versions of Blender work the loop count out from loop_start and no longer let it be set
+        if not mesh.polygons.bl_rna.properties['loop_total'].is_readonly:
+            mesh.polygons.foreach_set('loop_total', np.full(len(quads), 4, dtype=np.int32))
+        mesh.polygons.foreach_set('material_index', materials)
+        if uv_size:
+            mesh.uv_layers.new(name='UVMap')
+            mesh.uv_layers.active.data.foreach_set('uv', planar_uvs(vertices[quads], uv_size).ravel())
+        mesh.update(calc_edges=True)
+        return mesh
+
+    # creates an object using the mesh, linked into the active collection and made the active selected object
+    # so the scripts' cleanup steps (join, edit mode, ...) pick it up like they did the primitive_*_add objects
+    def to_object(self, name, uv_size=UV_SIZE):
+        ob = bpy.data.objects.new(name, self.to_mesh(name, uv_size))
+        bpy.context.collection.objects.link(ob)
+        ob.select_set(True)
+        bpy.context.view_layer.objects.active = ob
+        return ob
+
+
+# turns (n, 2) x, y positions into (n, 3) locations at height z
+def with_height(positions, z):
+    positions = np.asarray(positions, dtype=np.float32).reshape(-1, 2)
+    return np.column_stack((positions, np.full(len(positions), z, dtype=np.float32)))
+
+
+# (row, start, length) of every run of True cells along the rows of a 2d mask
+def row_runs(mask):
+    steps = np.diff(np.pad(mask, ((0, 0), (1, 1)), mode='constant').astype(np.int8), axis=1)
+    rows, starts = np.nonzero(steps == 1)
+    _, ends = np.nonzero(steps == -1)
+    return rows, starts, ends - starts
+
+
+# Covers the True cells of a 2d [y, x] mask with (x, y, w, h) rectangles: the runs along each row,
+# stacked on top of each other while the run below has the same start and length.
+def greedy_rectangles(mask):
+    open_rectangles = {}  # (start, length) -> the rectangle that run extends
+    x, y, w, h = [], [], [], []
+    for row, start, length in zip(*(part.tolist() for part in row_runs(mask))):
+        index = open_rectangles.get((start, length))
+        if index is not None and y[index] + h[index] == row:
+            h[index] += 1
+        else:
+            index = len(x)
+            x.append(start)
+            y.append(row)
+            w.append(length)
+            h.append(1)
+        open_rectangles[(start, length)] = index
+    return tuple(np.array(part, dtype=np.int64) for part in (x, y, w, h))
+
+
+# (x, y, w, h) rectangles for the faces of one side of a box grid, single cells unless greedy.
+# Top and bottom faces all share a plane and merge both ways, side faces only merge along the wall they are part of.
+def side_rectangles(mask, side, greedy):
+    if not greedy:
+        y, x = np.nonzero(mask)
+        return x, y, np.ones_like(x), np.ones_like(x)
+    if side in ('+z', '-z'):
+        return greedy_rectangles(mask)
+    if side in ('+y', '-y'):
+        y, x, w = row_runs(mask)
+        return x, y, w, np.ones_like(w)
+    x, y, h = row_runs(mask.T)
+    return x, y, np.ones_like(h), h
+
+
+# Per corner UVs for (n, 4, 3) quad corners, projected onto the two world axes each face lies along.
+def planar_uvs(corners, uv_size):
+    normals = np.cross(corners[:, 1] - corners[:, 0], corners[:, 2] - corners[:, 0])
+    axis = np.argmax(np.abs(normals), axis=1)
+    u_axis = np.where(axis == 0, 1, 0)  # faces looking along x use y for u, everything else uses x
+    v_axis = np.where(axis == 2, 1, 2)  # faces looking along z use y for v, everything else uses z
+    u = np.take_along_axis(corners, u_axis[:, None, None], axis=2)[..., 0]
+    v = np.take_along_axis(corners, v_axis[:, None, None], axis=2)[..., 0]
+    return np.stack((u, v), axis=2) / uv_size
+
+
+# The tile type under every face of mesh, for a tile grid (indexed [y, x]) laid out with tiles of size starting at
+# origin, the way the builders place them. Each face center is nudged a quarter tile back against its normal first,
+# so a wall's side faces, which sit right on the border between two tiles, land in the wall tile they belong to.
+# With floor_z, faces centered at that height count as floor_tile whatever is under them (wall bottoms, stair caps).
+def face_tiles(mesh, tiles, origin=(0, 0), size=2.0, floor_z=None, floor_tile=None):
+    count = len(mesh.polygons)
+    centers = np.empty(count * 3, dtype=np.float32)
+    normals = np.empty(count * 3, dtype=np.float32)
+    mesh.polygons.foreach_get('center', centers)
+    mesh.polygons.foreach_get('normal', normals)
+    centers = centers.reshape(-1, 3)
+    inside = centers[:, :2] - normals.reshape(-1, 3)[:, :2] * (size / 4)
+    cells = np.floor(inside / size - origin + 0.5).astype(np.int64)
+    x = np.clip(cells[:, 0], 0, tiles.shape[1] - 1)
+    y = np.clip(cells[:, 1], 0, tiles.shape[0] - 1)
+    face_tile = tiles[y, x]
+    if floor_z is not None:
+        face_tile[np.isclose(centers[:, 2], floor_z)] = floor_tile
+    return face_tile
+
+
+# Sets the material slot of every face of mesh from the tile type under it in one foreach_set, tile_materials maps
+# tile types to material slots and faces over any other tile get default. floor_z and floor_tile go to face_tiles.
+def assign_tile_materials(mesh, tiles, tile_materials, origin=(0, 0), size=2.0, default=0, floor_z=None,
+                          floor_tile=None):
+    slots = np.full(256, default, dtype=np.int32)  # tile types are uint8
+    for tile, slot in tile_materials.items():
+        slots[tile] = slot
+    mesh.polygons.foreach_set('material_index', slots[face_tiles(mesh, tiles, origin, size, floor_z, floor_tile)])
+    mesh.update()
+
+
+# Collects geometry a piece at a time (a row of cubes, ...) and commits it as a new object every time max_faces
+# faces have piled up, so memory stays bounded and no batch gets joined into a growing mesh more than once.
+# The objects are meant to be joined, welded and culled once at the end. Prints how long each batch took.
+class StreamingMeshBuilder:
+    def __init__(self, name, max_faces=BATCH_FACES):
+        self.name = name
+        self.max_faces = max_faces
+        self.builder = BatchMeshBuilder()
+        self.objects = []
+        self.batch_start = time.perf_counter()
+
+    def add_cubes(self, positions, z=0.0, size=2.0, material_index=0):
+        self.builder.add_cubes(positions, z, size, material_index)
+        if self.builder.face_count >= self.max_faces:
+            self.commit()
+
+    def commit(self):
+        face_count = self.builder.face_count
+        if face_count == 0:
+            return
+        self.objects.append(self.builder.to_object(self.name))
+        print(f'batch {len(self.objects)}: {face_count} faces in {time.perf_counter() - self.batch_start:.3f}s')
+        self.builder = BatchMeshBuilder()
+        self.batch_start = time.perf_counter()
+
+    # commits whatever is left and returns every object that was made
+    def finish(self):
+        self.commit()
+        return self.objects
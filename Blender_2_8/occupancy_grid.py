@@ -0,0 +1,51 @@
+'''
+Author: Aaron J. Olson
+https://aaronjolson.io
+
+Occupancy grid helpers for deriving level features from the floor layout in one vectorized pass.
+Floor cells are rasterized into a boolean grid, and the walls are every cell next to the floor that is
+not floor itself: dilate(floor) & ~floor. Each wall cell comes out exactly once.
+'''
+
+import numpy as np
+
+# grid steps to the neighbors that count as touching, for 4 (edges only) and 8 (edges and corners) connectivity
+NEIGHBOR_OFFSETS = {
+    4: ((0, 1), (1, 0), (0, -1), (-1, 0)),
+    8: ((0, 1), (1, 0), (0, -1), (-1, 0), (1, 1), (1, -1), (-1, 1), (-1, -1)),
+}
+
+
+# Rasterizes integer (x, y) cells into a boolean grid indexed [y, x], with a margin of empty cells around them.
+# Returns the grid and the (x, y) cell that grid[0, 0] stands for.
+def rasterize(cells, margin=1):
+    cells = np.asarray(cells, dtype=np.int64).reshape(-1, 2)
+    if len(cells) == 0:
+        return np.zeros((2 * margin, 2 * margin), dtype=bool), (-margin, -margin)
+    x_min, y_min = cells.min(axis=0) - margin
+    x_max, y_max = cells.max(axis=0) + margin
+    grid = np.zeros((y_max - y_min + 1, x_max - x_min + 1), dtype=bool)
+    grid[cells[:, 1] - y_min, cells[:, 0] - x_min] = True
+    return grid, (int(x_min), int(y_min))
+
+
+# grows the True cells of grid by one cell towards each of their neighbors, cells past the border count as empty
+def dilate(grid, connectivity=4):
+    padded = np.pad(grid, 1, mode='constant', constant_values=False)
+    rows, cols = grid.shape
+    dilated = grid.copy()
+    for dx, dy in NEIGHBOR_OFFSETS[connectivity]:
+        dilated |= padded[1 + dy:1 + dy + rows, 1 + dx:1 + dx + cols]
+    return dilated
+
+
+# the cells that touch the floor without being floor themselves
+def wall_mask(floor, connectivity=4):
+    return dilate(floor, connectivity) & ~floor
+
+
+# Returns the (x, y) wall cells around a collection of (x, y) floor cells as a (n, 2) int array.
+def wall_cells(floor_cells, connectivity=4):
+    floor, (x_origin, y_origin) = rasterize(floor_cells)
+    wall_y, wall_x = np.nonzero(wall_mask(floor, connectivity))
+    return np.column_stack((wall_x + x_origin, wall_y + y_origin))
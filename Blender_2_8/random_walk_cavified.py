@@ -10,59 +10,63 @@ Example of 3D model output
 https://sketchfab.com/models/97ef663c8f6040b8aecdaca2aa87989e
 '''
 
-import random
+import os
+import sys
+
 import bpy
 import bmesh
 
+# the helper modules live next to this script, make sure Blender can find them
+SCRIPT_DIRECTORY = os.path.dirname(os.path.abspath(__file__))
+if SCRIPT_DIRECTORY not in sys.path:
+    sys.path.append(SCRIPT_DIRECTORY)
+
+import cave_sculpt
+import mesh_builder
+import occupancy_grid
+import random_walk_engine
+
 ITERATIONS = 1000
+WALKERS = 1  # number of independent walkers, each of them takes ITERATIONS steps from the origin
+DIRECT_MESH = True  # build only the exposed faces of the walked cells, set to False for cubes + cleanup_mesh
+CAVIFY_MODE = 'BAKED'  # 'BAKED' writes NumPy noise into the mesh, 'MODIFIERS' adds Subdivision + Displace
+CAVE_EDGE_LENGTH = 0.25  # wall edge length the baked mode subdivides down to
+CAVE_SEED = 0  # the baked noise is the same for the same seed
+TRIANGLE_BUDGET = 2000000  # cavify subdivides less to stay under this many triangles, None for no limit
+VERTEX_BUDGET = None  # same for the vertices
 
 # Controls the distances that are moved
 # MUST BE AT LEAST 2
 X_MOVE_DISTANCE = 2.0
 Y_MOVE_DISTANCE = 2.0
 
-# Position in space
-y_pos = 0
-x_pos = 0
-
 
 def generate_maze():
-    for i in range(ITERATIONS):
-        direction = get_random_direction()
-        next_move(direction)
-    cleanup_mesh()
+    # every walk is drawn and summed up in one go, each cell that was stepped on gets a single cube
+    cells, _ = random_walk_engine.walk_array(ITERATIONS, walkers=WALKERS)
+    # the shell only matches the cubes while they sit right next to each other, with move distances of 2
+    if DIRECT_MESH and X_MOVE_DISTANCE == Y_MOVE_DISTANCE == 2.0:
+        place_shell(cells)
+    else:
+        place_cubes(cells * (X_MOVE_DISTANCE, Y_MOVE_DISTANCE))
+        cleanup_mesh()
     cavify()
 
 
-def get_random_direction():
-    direction = {0: 'up', 1: 'right', 2: 'down', 3: 'left'}
-    random_num = random.randint(0, 3)
-    return direction[random_num]
-
-
-def next_move(direction):
-    global y_pos
-    global x_pos
+# one cube per (x, y) position, all of them in a single object
+def place_cubes(positions):
+    builder = mesh_builder.BatchMeshBuilder()
+    builder.add_cubes(positions)
+    builder.to_object('Cube')
 
-    if direction == 'up':
-        y_pos += Y_MOVE_DISTANCE
-        place_cube()
 
-    if direction == 'right':
-        x_pos += X_MOVE_DISTANCE
-        place_cube()
-
-    if direction == 'down':
-        y_pos -= Y_MOVE_DISTANCE
-        place_cube()
-
-    if direction == 'left':
-        x_pos -= X_MOVE_DISTANCE
-        place_cube()
-
-
-def place_cube():
-    bpy.ops.mesh.primitive_cube_add(size=2, enter_editmode=False, location=(x_pos, y_pos, 0))
+# the exposed faces of one cube per walked cell, welded as they are built, ready for cavify
+def place_shell(cells):
+    solid, origin = occupancy_grid.rasterize(cells, margin=0)
+    builder = mesh_builder.BatchMeshBuilder()
+    # no greedy merging here, the T-junctions it leaves would crack open under cavify's displacement
+    builder.add_grid_shell(solid, origin)
+    builder.to_object('Cube')
 
 
 # combines the cubes into one object and removes interior faces
@@ -91,80 +95,15 @@ def cleanup_mesh():
     bpy.ops.mesh.delete(type='FACE')
 
 
+# roughens the level up into a cave, baked into the mesh or with modifiers, neither needs a 3D view (runs headless)
 def cavify():
-    win = bpy.context.window
-    scr = win.screen
-    areas3d = [area for area in scr.areas if area.type == 'VIEW_3D']
-    region = [region for region in areas3d[0].regions if region.type == 'WINDOW']
-
-    override = {'window': win,
-                'screen': scr,
-                'area': areas3d[0],
-                'region': region[0],
-                'scene': bpy.context.scene,
-                }
-
-    bpy.ops.object.mode_set(mode='EDIT')
-    bpy.ops.mesh.loopcut_slide(
-        override,
-        MESH_OT_loopcut={
-            "number_cuts": 1,
-            "smoothness": 0,
-            "falloff": 'INVERSE_SQUARE',
-            "edge_index": 1,
-            "mesh_select_mode_init": (False, False, True)
-        },
-        TRANSFORM_OT_edge_slide={
-            "value": 0.637373,
-            "single_side": False,
-            "use_even": False,
-            "flipped": False,
-            "use_clamp": True,
-            "mirror": False,
-            "snap": False,
-            "snap_target": 'CLOSEST',
-            "snap_point": (0, 0, 0),
-            "snap_align": False,
-            "snap_normal": (0, 0, 0),
-            "correct_uv": False,
-            "release_confirm": False,
-            "use_accurate": False
-        }
-    )
-
-    # space and search for flip normals
-    bpy.ops.mesh.select_all(action='TOGGLE')
-    bpy.ops.mesh.flip_normals()
-    bpy.ops.object.modifier_add(type='SUBSURF')
-    bpy.context.object.modifiers["Subdivision"].levels = 4
-
-    # add the displacement modifiers
-    bpy.ops.object.modifier_add(type='DISPLACE')
-    bpy.ops.texture.new()
-    bpy.data.textures["Texture"].type = 'STUCCI'
-    bpy.data.textures["Texture"].noise_scale = 0.75
-    bpy.context.object.modifiers["Displace"].direction = 'X'
-    bpy.data.textures["Texture"].turbulence = 10
-    bpy.context.object.modifiers["Displace"].texture = bpy.data.textures["Texture"]
-
-    bpy.ops.object.modifier_add(type='DISPLACE')
-    bpy.ops.texture.new()
-    bpy.data.textures["Texture.001"].type = 'STUCCI'
-    bpy.data.textures["Texture.001"].noise_scale = 0.75
-    bpy.context.object.modifiers["Displace.001"].direction = 'Y'
-    bpy.context.object.modifiers["Displace.001"].texture = bpy.data.textures["Texture.001"]
-
-    bpy.ops.object.modifier_add(type='DISPLACE')
-    bpy.ops.texture.new()
-    bpy.data.textures["Texture.002"].type = 'CLOUDS'
-    bpy.data.textures["Texture.002"].noise_scale = 0.65
-    bpy.context.object.modifiers["Displace.002"].strength = 0.20
-    bpy.context.object.modifiers["Displace.002"].texture = bpy.data.textures["Texture.002"]
-
-    bpy.context.object.modifiers["Displace"].strength = 0.7
-    bpy.context.object.modifiers["Displace.001"].strength = 0.6
-
     bpy.ops.object.mode_set(mode='OBJECT')
+    if CAVIFY_MODE == 'BAKED':
+        cave_sculpt.bake_cave(bpy.context.object, CAVE_EDGE_LENGTH, CAVE_SEED,
+                              max_triangles=TRIANGLE_BUDGET, max_vertices=VERTEX_BUDGET)
+    else:
+        levels, triangles = cave_sculpt.add_cave_modifiers(bpy.context.object, TRIANGLE_BUDGET, VERTEX_BUDGET)
+        print(f'subdivision level {levels}: about {triangles} triangles (budget {TRIANGLE_BUDGET})')
 
 
 if __name__ == "__main__":
@@ -0,0 +1,77 @@
+'''
+Author: Aaron J. Olson
+https://aaronjolson.io
+
+Random walk core used by the random walk generators.
+Instead of appending every step to a list and searching that list, the walk is tallied in a hash map keyed by cell,
+which gives the unique cells that were walked on together with how often each of them was visited.
+The steps are drawn, accumulated and counted by C level builtins (random.choices, itertools.accumulate,
+collections.Counter), so even ITERATIONS = 10,000,000 only takes a few seconds.
+
+walk_array does the same with NumPy: all of the directions are drawn in one call, turned into positions with a
+cumulative sum and deduplicated with np.unique, for any number of independent walkers at once (drunkard's walk).
+'''
+
+import random
+import time
+from collections import Counter
+from itertools import accumulate, chain, islice
+
+import numpy as np
+
+ITERATIONS = 10000000
+WALKERS = 16
+
+# grid steps for the four directions the walker can take
+DIRECTIONS = {'up': (0, 1), 'right': (1, 0), 'down': (0, -1), 'left': (-1, 0)}
+X_STEPS = np.array([dx for dx, dy in DIRECTIONS.values()], dtype=np.int8)
+Y_STEPS = np.array([dy for dx, dy in DIRECTIONS.values()], dtype=np.int8)
+
+
+# Walks iterations random steps starting from start and returns a Counter mapping every (x, y) cell that was
+# stepped on to the number of times it was stepped on. Like the scripts, the start cell is only counted
+# if the walker comes back to it.
+def walk(iterations, start=(0, 0), seed=None):
+    rng = random if seed is None else random.Random(seed)
+    # Cells are packed into a single int (x + y * stride, relative to the start) while walking. That never collides
+    # because the walker can not get further than iterations steps away from the start.
+    stride = 2 * iterations + 1
+    steps = [dx + dy * stride for dx, dy in DIRECTIONS.values()]
+    positions = accumulate(chain([0], rng.choices(steps, k=iterations)))
+    packed_counts = Counter(islice(positions, 1, None))
+
+    visit_counts = Counter()
+    for key, count in packed_counts.items():
+        y = (key + iterations) // stride
+        visit_counts[(start[0] + key - y * stride, start[1] + y)] = count
+    return visit_counts
+
+
+# Walks `walkers` independent walkers `iterations` steps each. start is a single (x, y) shared by every walker,
+# or one (x, y) row per walker. Returns the unique (x, y) cells that were stepped on as a (n, 2) int array
+# and the number of times each of them was stepped on.
+def walk_array(iterations, walkers=1, start=(0, 0), seed=None):
+    rng = np.random.RandomState(seed)  # not default_rng, which the NumPy of the older 2.8x releases does not have
+    directions = rng.randint(0, len(DIRECTIONS), size=(walkers, iterations), dtype=np.int8)
+    start = np.broadcast_to(np.asarray(start, dtype=np.int64), (walkers, 2))
+    x = np.cumsum(X_STEPS[directions], axis=1, dtype=np.int64) + start[:, :1]
+    y = np.cumsum(Y_STEPS[directions], axis=1, dtype=np.int64) + start[:, 1:]
+
+    # pack each cell into one int so np.unique can sort plain numbers instead of rows
+    x_min = x.min(initial=0)
+    y_min = y.min(initial=0)
+    stride = x.max(initial=0) - x_min + 1
+    keys = (x - x_min) + (y - y_min) * stride
+    unique_keys, counts = np.unique(keys, return_counts=True)
+    cells = np.column_stack((unique_keys % stride + x_min, unique_keys // stride + y_min))
+    return cells, counts
+
+
+if __name__ == '__main__':
+    start_time = time.perf_counter()
+    counts = walk(ITERATIONS, seed=0)
+    print(f'{ITERATIONS} steps, {len(counts)} unique cells: {time.perf_counter() - start_time:.3f}s')
+    start_time = time.perf_counter()
+    unique_cells, cell_counts = walk_array(ITERATIONS // WALKERS, walkers=WALKERS, seed=0)
+    print(f'{WALKERS} walkers x {ITERATIONS // WALKERS} steps, {len(unique_cells)} unique cells: '
+          f'{time.perf_counter() - start_time:.3f}s')
@@ -10,8 +10,20 @@ Example of 3D model output
 https://sketchfab.com/models/97ef663c8f6040b8aecdaca2aa87989e
 '''
 
-import random
+import os
+import sys
+
 import bpy
+import numpy as np
+
+# the helper modules live next to this script, make sure Blender can find them
+SCRIPT_DIRECTORY = os.path.dirname(os.path.abspath(__file__))
+if SCRIPT_DIRECTORY not in sys.path:
+    sys.path.append(SCRIPT_DIRECTORY)
+
+import mesh_builder
+import occupancy_grid
+import random_walk_engine
 
 ITERATIONS = 1000
 
@@ -20,69 +32,34 @@ ITERATIONS = 1000
 X_MOVE_DISTANCE = 2.0
 Y_MOVE_DISTANCE = 2.0
 
-# Position in space
-y_pos = 0
-x_pos = 0
-
-visited = []  # walkable tile
-walls = []
+WALL_CONNECTIVITY = 4  # 4 only walls in the floor's edges, 8 also fills in the outside corners
 
 
 def generate_maze():
-    for i in range(ITERATIONS):
-        direction = get_random_direction()
-        next_move(direction)
-    build_walls()
+    # the walk only hands back each cell once, no matter how often the walker stepped on it
+    visit_counts = random_walk_engine.walk(ITERATIONS)
+    place_tiles(np.array(list(visit_counts)) * (X_MOVE_DISTANCE, Y_MOVE_DISTANCE))
+    build_walls(list(visit_counts))
     cleanup_mesh()
 
 
-def get_random_direction():
-    direction = {0: 'up', 1: 'right', 2: 'down', 3: 'left'}
-    random_num = random.randint(0, 3)
-    return direction[random_num]
-
-
-def next_move(direction):
-    global y_pos
-    global x_pos
-
-    if direction == 'up':
-        y_pos += Y_MOVE_DISTANCE
-
-    if direction == 'right':
-        x_pos += X_MOVE_DISTANCE
-
-    if direction == 'down':
-        y_pos -= Y_MOVE_DISTANCE
-
-    if direction == 'left':
-        x_pos -= X_MOVE_DISTANCE
-    place_tile(x_pos, y_pos)
-    visited.append((x_pos, y_pos))
-
-
-def place_cube(x, y):
-    bpy.ops.mesh.primitive_cube_add(size=2, enter_editmode=False, location=(x, y, 0))
-
-
-def place_tile(x, y):
-    bpy.ops.mesh.primitive_plane_add(size=2, enter_editmode=False, location=(x, y, -1))
+# one cube per (x, y) position, all of them in a single object
+def place_cubes(positions):
+    builder = mesh_builder.BatchMeshBuilder()
+    builder.add_cubes(positions)
+    builder.to_object('Cube')
 
 
-def check_neighbors_and_place_wall(pos):
-    offset_map = [(pos[0] - 2.0, pos[1]),
-                  (pos[0] + 2.0, pos[1]),
-                  (pos[0], pos[1] - 2.0),
-                  (pos[0], pos[1] + 2.0)]
-    for offset_tuple in offset_map:
-        if offset_tuple not in visited and offset_map not in walls:
-            place_cube(offset_tuple[0], offset_tuple[1])
-            walls.append((offset_tuple[0], offset_tuple[1]))
+# one floor tile per (x, y) position, all of them in a single object
+def place_tiles(positions):
+    builder = mesh_builder.BatchMeshBuilder()
+    builder.add_planes(positions, z=-1)
+    builder.to_object('Plane')
 
 
-def build_walls():
-    for position in visited:
-        check_neighbors_and_place_wall(position)
+# every cell bordering the walked floor that is not floor itself gets a wall cube, exactly once
+def build_walls(floor_cells):
+    place_cubes(occupancy_grid.wall_cells(floor_cells, WALL_CONNECTIVITY) * (X_MOVE_DISTANCE, Y_MOVE_DISTANCE))
 
 
 # joins all separate objects into a single object and delete duplicate verts
@@ -10,58 +10,58 @@ Example of 3D model output
 https://sketchfab.com/models/97ef663c8f6040b8aecdaca2aa87989e
 '''
 
-import random
+import os
+import sys
+
 import bpy
 import bmesh
 
+# the helper modules live next to this script, make sure Blender can find them
+SCRIPT_DIRECTORY = os.path.dirname(os.path.abspath(__file__))
+if SCRIPT_DIRECTORY not in sys.path:
+    sys.path.append(SCRIPT_DIRECTORY)
+
+import mesh_builder
+import occupancy_grid
+import random_walk_engine
+
 ITERATIONS = 1000
+WALKERS = 1  # number of independent walkers, each of them takes ITERATIONS steps from the origin
+DIRECT_MESH = True  # build only the exposed faces of the walked cells, set to False for cubes + cleanup_mesh
+GREEDY_MESH = False  # merge coplanar faces into larger rectangles, far fewer faces for game engines
 
 # Controls the distances that are moved
 # MUST BE AT LEAST 2
 X_MOVE_DISTANCE = 2.0
 Y_MOVE_DISTANCE = 2.0
 
-# Position in space
-y_pos = 0
-x_pos = 0
-
 
 def generate_maze():
-    for i in range(ITERATIONS):
-        direction = get_random_direction()
-        next_move(direction)
-    cleanup_mesh()
-
-
-def get_random_direction():
-    direction = {0: 'up', 1: 'right', 2: 'down', 3: 'left'}
-    random_num = random.randint(0, 3)
-    return direction[random_num]
-
-
-def next_move(direction):
-    global y_pos
-    global x_pos
-
-    if direction == 'up':
-        y_pos += Y_MOVE_DISTANCE
-        place_cube()
-
-    if direction == 'right':
-        x_pos += X_MOVE_DISTANCE
-        place_cube()
-
-    if direction == 'down':
-        y_pos -= Y_MOVE_DISTANCE
-        place_cube()
-
-    if direction == 'left':
-        x_pos -= X_MOVE_DISTANCE
-        place_cube()
-
-
-def place_cube():
-    bpy.ops.mesh.primitive_cube_add(size=2, enter_editmode=False, location=(x_pos, y_pos, 0))
+    # every walk is drawn and summed up in one go, each cell that was stepped on gets a single cube
+    cells, _ = random_walk_engine.walk_array(ITERATIONS, walkers=WALKERS)
+    # the shell only matches the cubes while they sit right next to each other, with move distances of 2
+    if DIRECT_MESH and X_MOVE_DISTANCE == Y_MOVE_DISTANCE == 2.0:
+        place_shell(cells)
+    else:
+        place_cubes(cells * (X_MOVE_DISTANCE, Y_MOVE_DISTANCE))
+        cleanup_mesh()
+
+
+# one cube per (x, y) position, all of them in a single object
+def place_cubes(positions):
+    builder = mesh_builder.BatchMeshBuilder()
+    builder.add_cubes(positions)
+    builder.to_object('Cube')
+
+
+# the hollow shell of one cube per walked cell, built from the occupancy grid with only the exposed faces
+def place_shell(cells):
+    solid, origin = occupancy_grid.rasterize(cells, margin=0)
+    builder = mesh_builder.BatchMeshBuilder()
+    builder.add_grid_shell(solid, origin, greedy=GREEDY_MESH)
+    if GREEDY_MESH:
+        print(f'greedy meshing: {builder.unmerged_face_count} faces -> {builder.face_count}')
+    builder.to_object('Cube')
 
 
 # joins all separate objects into a single object,
@@ -10,10 +10,20 @@ Example of 3D model output
 https://sketchfab.com/models/a04f59e37966449c98c2839999800c8a
 '''
 
+import os
 import random
+import sys
+
 import bpy
 import bmesh
 
+# the helper modules live next to this script, make sure Blender can find them
+SCRIPT_DIRECTORY = os.path.dirname(os.path.abspath(__file__))
+if SCRIPT_DIRECTORY not in sys.path:
+    sys.path.append(SCRIPT_DIRECTORY)
+
+from face_index import FaceIndex
+
 ITERATIONS = 1000
 
 current = None
@@ -28,8 +38,8 @@ x_pos = 1.0
 x_move_distance = 2.0
 y_move_distance = 2.0
 
-# For keeping track of all of the moves that have been made
-visited_list = []
+# For keeping track of all of the positions that have been reached
+visited_list = set()
 
 # make sure an object called 'Cube' is present in the scene, else add one
 if bpy.data.objects.get('Cube'):
@@ -42,6 +52,9 @@ else:
     bpy.ops.object.mode_set(mode='EDIT')
     mesh = bmesh.from_edit_mesh(bpy.context.object.data)
 
+# looks up the face to extrude from by its position and normal, kept up to date as the mesh grows
+face_index = FaceIndex(mesh)
+
 
 def main():
     # Ensure that no faces are currently selected
@@ -51,7 +64,8 @@ def main():
     for i in range(ITERATIONS):
         direction = get_random_direction()
         next_mesh_move(direction)
-        visited_list.append((x_pos, y_pos))
+        visited_list.add((x_pos, y_pos))
+    bmesh.update_edit_mesh(ob.data)
     cleanup()
 
 
@@ -65,61 +79,42 @@ def next_mesh_move(direction):
     global next_face
     global y_pos
     global x_pos
-    for f in mesh.faces:
-        f.select = False
 
     if direction == 'up':
         if (x_pos, y_pos + y_move_distance) not in visited_list:
-            for f in mesh.faces:
-                # Using face.calc_center_median and a walking through an array of x,y moves
-                # we can calculate roughly which square we should appear on.
-                # We can then select and set the right face to start the extrusion process from
-                if f.normal.y == 1.0 and \
-                        round(f.calc_center_median()[1]) == y_pos and \
-                        round(f.calc_center_median()[0]) == x_pos - 1:
-                    f.select = True
-                    next_face = f
-                    y_pos += y_move_distance
-            extrude_up()
+            # The face index is keyed by the rounded face.calc_center_median and the direction of the normal,
+            # so the face to start the extrusion process from is looked up directly from the x,y position
+            next_face = face_index.get(x_pos - 1, y_pos, '+y')
+            if next_face:
+                y_pos += y_move_distance
+                extrude_up()
         else:
             y_pos += y_move_distance
 
     if direction == 'right':
         if (x_pos + x_move_distance, y_pos) not in visited_list:
-            for f in mesh.faces:
-                if f.normal.x == 1.0 and \
-                        round(f.calc_center_median()[0]) == x_pos and \
-                        round(f.calc_center_median()[1]) == y_pos - 1:
-                    f.select = True
-                    next_face = f
-                    x_pos += x_move_distance
-            extrude_right()
+            next_face = face_index.get(x_pos, y_pos - 1, '+x')
+            if next_face:
+                x_pos += x_move_distance
+                extrude_right()
         else:
             x_pos += x_move_distance
 
     if direction == 'down':
         if (x_pos, y_pos - y_move_distance) not in visited_list:
-            for f in mesh.faces:
-                if f.normal.y == -1.0 and \
-                        round(f.calc_center_median()[1]) == y_pos - y_move_distance and \
-                        round(f.calc_center_median()[0]) == x_pos - 1:
-                    f.select = True
-                    next_face = f
-                    y_pos -= y_move_distance
-            extrude_down()
+            next_face = face_index.get(x_pos - 1, y_pos - y_move_distance, '-y')
+            if next_face:
+                y_pos -= y_move_distance
+                extrude_down()
         else:
             y_pos -= y_move_distance
 
     if direction == 'left':
         if (x_pos - x_move_distance, y_pos) not in visited_list:
-            for f in mesh.faces:
-                if f.normal.x == -1.0 and \
-                        round(f.calc_center_median()[0]) == x_pos - x_move_distance and \
-                        round(f.calc_center_median()[1]) == y_pos - 1:
-                    f.select = True
-                    next_face = f
-                    x_pos -= x_move_distance
-            extrude_left()
+            next_face = face_index.get(x_pos - x_move_distance, y_pos - 1, '-x')
+            if next_face:
+                x_pos -= x_move_distance
+                extrude_left()
         else:
             x_pos -= x_move_distance
 
@@ -140,21 +135,10 @@ def extrude_left():
     extrude(-x_move_distance, 0, 0)
 
 
+# extrudes next_face with bmesh.ops and moves on to the face at the end of the new segment
 def extrude(x, y, z):
-    bpy.ops.mesh.extrude_region_move()
-    bpy.ops.transform.translate(value=(x, y, z),
-                                orient_type='GLOBAL',
-                                orient_matrix=((1, 0, 0), (0, 1, 0), (0, 0, 1)),
-                                orient_matrix_type='GLOBAL',
-                                constraint_axis=(False, False, True),
-                                mirror=True,
-                                use_proportional_edit=False,
-                                proportional_edit_falloff='SMOOTH',
-                                proportional_size=1,
-                                use_proportional_connected=False,
-                                use_proportional_projected=False
-                                )
-
+    global next_face
+    next_face = face_index.extrude(next_face, (x, y, z))
 
 
 def cleanup():
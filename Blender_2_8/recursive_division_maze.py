@@ -9,12 +9,25 @@ https://sketchfab.com/models/8587b464b2034485886cd094c7adf14c
 '''
 
 import math
+import os
 import random
+import sys
+
 import bpy
 import bmesh
+import numpy as np
+
+# the helper modules live next to this script, make sure Blender can find them
+SCRIPT_DIRECTORY = os.path.dirname(os.path.abspath(__file__))
+if SCRIPT_DIRECTORY not in sys.path:
+    sys.path.append(SCRIPT_DIRECTORY)
+
+import mesh_builder
 
 SIZE = 49
 MIN_SIZE = SIZE / 4
+DIRECT_MESH = True  # build only the exposed faces straight from the map, set to False for cubes + cleanup_mesh
+GREEDY_MESH = False  # merge coplanar faces into larger rectangles, far fewer faces for game engines
 
 
 def generate_level(size):
@@ -25,10 +38,14 @@ def generate_level(size):
     # build out the map, these two functions do all of the procedural work
     add_inner_walls(level_map, 1, 1, size - 2, size - 2)
     add_outer_walls(level_map, SIZE)
-    # populate the scene with cubes according to the map matrix
-    add_cubes(level_map)
-    # combines the cubes into one object and removes interior faces
-    cleanup_mesh()
+    if DIRECT_MESH:
+        # builds the hollow level mesh right away
+        add_shell(level_map)
+    else:
+        # populate the scene with cubes according to the map matrix
+        add_cubes(level_map)
+        # combines the cubes into one object and removes interior faces
+        cleanup_mesh()
 
 
 # generate 2d array with list comprehension
@@ -94,16 +111,21 @@ def build_wall(level_map, is_vertical, minimum, maximum, loc):
                 level_map[i][loc] = 1
 
 
-# adds cubes to the map based on the level_map matrix
+# adds cubes to the map based on the level_map matrix, all of them in one mesh
 def add_cubes(level_map):
-    y = 0
-    for row in level_map:
-        x = 0
-        for value in row:
-            if value == 0:  # cells with value 0 get cubes placed on them
-                bpy.ops.mesh.primitive_cube_add(size=2, enter_editmode=False, location=(x, y, 0))
-            x += 2
-        y += 2
+    cube_y, cube_x = np.nonzero(np.array(level_map) == 0)  # cells with value 0 get cubes placed on them
+    builder = mesh_builder.BatchMeshBuilder()
+    builder.add_cubes(np.column_stack((cube_x, cube_y)) * 2)
+    builder.to_object('Cube')
+
+
+# the same hollow mesh add_cubes + cleanup_mesh end up with, made from the wall cells' exposed faces only
+def add_shell(level_map):
+    builder = mesh_builder.BatchMeshBuilder()
+    builder.add_grid_shell(np.array(level_map) == 0, greedy=GREEDY_MESH)
+    if GREEDY_MESH:
+        print(f'greedy meshing: {builder.unmerged_face_count} faces -> {builder.face_count}')
+    builder.to_object('Cube')
 
 
 # combines the cubes into one object and removes interior faces